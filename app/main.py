@@ -1,16 +1,29 @@
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Response, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 from app.models import StockAnalysisRequest, StockAnalysisResponse, NewsArticle
 from app.services.news_service import get_news_articles
 from app.services.analysis_service import analyze_articles
 from app.services.report_service import generate_report
+from app.services.loop_monitor import loop_monitor, LOOP_MONITOR_ENABLED
+from contextlib import asynccontextmanager
+from typing import Optional
+import hmac
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="Rust: A Tool by Carfagno Enterprises")
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+
+app = FastAPI(title="Rust: A Tool by Carfagno Enterprises", lifespan=lifespan)
 
 @app.get("/health")
 async def health_check():
@@ -30,6 +43,21 @@ app.add_middleware(
 async def root():
     return {"message": "Welcome to Rust: A Tool by Carfagno Enterprises"}
 
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime metrics for the service."""
+    return {"event_loop": loop_monitor.metrics()}
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Debug endpoints expose stacks and file paths; require X-Admin-Token: <PROFILE_ADMIN_TOKEN>."""
+    if not PROFILE_ADMIN_TOKEN or x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), PROFILE_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/debug/loop", dependencies=[Depends(require_admin)])
+async def debug_loop():
+    """Event loop lag summary and recent slow callbacks with captured stacks."""
+    return {"metrics": loop_monitor.metrics(), "slow_callbacks": loop_monitor.slow_callbacks()}
+
 @app.post("/api/analyze", response_model=StockAnalysisResponse)
 async def analyze_stock(request: StockAnalysisRequest):
     try:
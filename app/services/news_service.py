@@ -1,4 +1,5 @@
 from typing import List, Dict, Any
+import asyncio
 import requests
 import os
 from dotenv import load_dotenv
@@ -31,7 +32,11 @@ async def get_news_articles(ticker: str, days: int = 7) -> List[Dict[str, Any]]:
     }
     
     try:
-        response = requests.get(NEWS_API_BASE_URL, params=params)
+        # requests is blocking; run it in a worker thread so a slow fetch
+        # does not stall the event loop for every other request
+        response = await asyncio.to_thread(
+            requests.get, NEWS_API_BASE_URL, params=params, timeout=30
+        )
         response.raise_for_status()
         data = response.json()
         
@@ -1 +1,4 @@
+# Load .env once, before any app module reads its settings from the environment
+from dotenv import load_dotenv
 
+load_dotenv()
@@ -1,22 +1,71 @@
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Response, Header, Query, Request, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-from app.models import StockAnalysisRequest, StockAnalysisResponse, NewsArticle
+from fastapi.responses import StreamingResponse
+from datetime import datetime, date, timedelta
+from app.models import StockAnalysisRequest, StockAnalysisResponse, normalize_ticker
 from app.services.news_service import get_news_articles, setup_logging
-from app.services.analysis_service import analyze_articles
+from app.services.analysis_service import get_client, client_ready
+from app.services.validation_service import validation_stats
+from app.services.pipeline_service import to_news_articles, analyze_with_store
+from app.services.news_providers import close_session
+from app.services.rollup_service import rollup_store
+from app.services.export_service import export_stream, ExportUnavailableError, FORMATS
 from app.services.report_service import generate_report
+from app.services.admission_service import admission_controller, client_key, AdmissionRejected
+from app.services.subscription_service import ticker_hub, build_update, SlowConsumerError, ConnectionLimitError
+from app.services.loop_monitor import loop_monitor, LOOP_MONITOR_ENABLED
+from app.services.profiling_service import profiler, stage, annotate
+from app.services.capture_service import traffic_capture
+from app.services.executor_service import cpu_executor
+from app.services.shared_state import shared_state
+from app.services.analysis_archive import analysis_archive
+from app.services.quota_service import quota_manager, PRIORITIES, PRIORITY_INTERACTIVE
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import importlib
+import json
+import logging
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
-setup_logging()
+# Build upstream clients in the background after startup instead of on the first request
+CLIENT_WARMUP = os.getenv("CLIENT_WARMUP", "true").lower() == "true"
 
-app = FastAPI(title="Rust: A Tool by Carfagno Enterprises")
+async def warm_up_clients():
+    """Import the HTTP/OpenAI libraries and build clients in a worker thread."""
+    try:
+        await asyncio.to_thread(importlib.import_module, "aiohttp")
+        await asyncio.to_thread(get_client)
+        logging.info("Upstream clients ready")
+    except Exception as e:
+        logging.warning(f"Client warm-up failed, clients will be built on first use: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    warmup = asyncio.create_task(warm_up_clients()) if CLIENT_WARMUP else None
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    await ticker_hub.close()
+    await close_session()
+    await loop_monitor.stop()
+    cpu_executor.shutdown()
+    shared_state.close()
+
+app = FastAPI(title="Rust: A Tool by Carfagno Enterprises", lifespan=lifespan)
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint to verify API is running."""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "clients_ready": client_ready(),
+        "newsapi_quota": await asyncio.to_thread(quota_manager.status)
+    }
 
 # Configure CORS
 origins = [
@@ -45,11 +94,225 @@ async def check_env():
         "OPENAI_API_KEY": str(bool(os.getenv("OPENAI_API_KEY")))
     }
 
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime metrics for the service."""
+    return {
+        "event_loop": loop_monitor.metrics(),
+        "websockets": ticker_hub.metrics(),
+        "admission": admission_controller.metrics(),
+        "llm_validation": validation_stats.metrics(),
+        "cpu_executor": cpu_executor.metrics(),
+        "shared_state": shared_state.metrics(),
+        "analysis_archive": analysis_archive.metrics()
+    }
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Debug endpoints expose stacks, file paths and timings; require X-Admin-Token: <PROFILE_ADMIN_TOKEN>."""
+    if not profiler.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/debug/loop", dependencies=[Depends(require_admin)])
+async def debug_loop():
+    """Event loop lag summary and recent slow callbacks with captured stacks."""
+    return {"metrics": loop_monitor.metrics(), "slow_callbacks": loop_monitor.slow_callbacks()}
+
+@app.get("/api/debug/profiles", dependencies=[Depends(require_admin)])
+async def debug_profiles():
+    """Summaries of recently captured request profiles, newest first."""
+    return {"enabled": profiler.enabled, "profiles": profiler.list()}
+
+@app.get("/api/debug/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def debug_profile(profile_id: str, format: str = "speedscope"):
+    """A captured request profile as speedscope JSON or folded stacks for flamegraph.pl."""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    if format == "folded":
+        return Response(content=profile.to_folded(), media_type="text/plain")
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="Unsupported format: use 'speedscope' or 'folded'")
+    return {"summary": profile.summary(), **profile.to_speedscope()}
+
+def parse_ticker(value: str) -> str:
+    try:
+        return normalize_ticker(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/tickers/{ticker}/sentiment")
+async def ticker_sentiment(
+    ticker: str,
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to")
+):
+    """Daily sentiment time series for a ticker, served from the materialized rollups."""
+    to_date = to_date or datetime.utcnow().date()
+    from_date = from_date or to_date - timedelta(days=30)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    ticker = parse_ticker(ticker)
+    points = await rollup_store.query(ticker, from_date, to_date)
+    return {
+        "ticker": ticker,
+        "from": from_date.isoformat(),
+        "to": to_date.isoformat(),
+        "points": points
+    }
+
+@app.get("/api/export")
+async def export_analyses(
+    tickers: str,
+    format: str = "csv",
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to")
+):
+    """Stream stored articles and analyses for a comma-separated ticker list as CSV, NDJSON or Parquet."""
+    fmt = format.lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}. Use one of: {', '.join(FORMATS)}")
+    ticker_list = [parse_ticker(t) for t in tickers.split(",") if t.strip()]
+    if not ticker_list:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    try:
+        body = export_stream(fmt, ticker_list, from_date, to_date)
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    media_type, extension = FORMATS[fmt]
+    filename = f"analyses_{'_'.join(ticker_list)}_{datetime.utcnow():%Y%m%d}.{extension}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def receive_command(websocket: WebSocket):
+    """The client's next message parsed as JSON, or None for binary or malformed frames."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(code=message.get("code", 1000), reason=message.get("reason"))
+    if message.get("text") is None:
+        return None
+    try:
+        return json.loads(message["text"])
+    except json.JSONDecodeError:
+        return None
+
+@app.websocket("/api/ws/tickers")
+async def ticker_updates(websocket: WebSocket, tickers: str = ""):
+    """
+    Push analysis updates for subscribed tickers.
+    
+    Subscribe with the ``tickers`` query parameter or by sending
+    {"action": "subscribe" | "unsubscribe", "tickers": ["AAPL", ...]}.
+    """
+    await websocket.accept()
+    try:
+        subscriber = ticker_hub.connect()
+    except ConnectionLimitError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+    
+    # Only this task writes to the socket; everything outbound goes through the subscriber's queue
+    async def send_updates():
+        while True:
+            message = await subscriber.next_message()
+            await websocket.send_json(message)
+    
+    sender = asyncio.create_task(send_updates())
+    # Fails with SlowConsumerError as soon as the subscriber drops too many messages
+    too_slow = asyncio.create_task(subscriber.wait_too_slow())
+    slow = False
+    try:
+        if tickers:
+            added = ticker_hub.subscribe(subscriber, tickers.split(","))
+            subscriber.offer({"type": "subscribed", "tickers": sorted(subscriber.tickers), "added": added})
+        while True:
+            receive = asyncio.create_task(receive_command(websocket))
+            done, _ = await asyncio.wait({receive, sender, too_slow}, return_when=asyncio.FIRST_COMPLETED)
+            for task in (too_slow, sender):
+                if task in done:
+                    receive.cancel()
+                    task.result()
+            message = receive.result()
+            action = message.get("action") if isinstance(message, dict) else None
+            requested = message.get("tickers", []) if isinstance(message, dict) else []
+            if action not in ("subscribe", "unsubscribe") or not isinstance(requested, list):
+                subscriber.offer({"type": "error", "detail": "Expected {\"action\": \"subscribe\"|\"unsubscribe\", \"tickers\": [...]}"})
+                continue
+            if action == "subscribe":
+                added = ticker_hub.subscribe(subscriber, [str(t) for t in requested])
+                subscriber.offer({"type": "subscribed", "tickers": sorted(subscriber.tickers), "added": added})
+            else:
+                ticker_hub.unsubscribe(subscriber, [str(t) for t in requested])
+                subscriber.offer({"type": "unsubscribed", "tickers": sorted(subscriber.tickers)})
+    except WebSocketDisconnect:
+        pass
+    except SlowConsumerError as e:
+        slow = True
+        # Stop the blocked sender first; the close frame itself may not get through to a stalled client
+        sender.cancel()
+        try:
+            await asyncio.wait_for(websocket.close(code=1013, reason=str(e)), timeout=5)
+        except Exception:
+            pass
+    finally:
+        sender.cancel()
+        too_slow.cancel()
+        ticker_hub.disconnect(subscriber, slow=slow)
+
 @app.post("/api/analyze", response_model=StockAnalysisResponse)
-async def analyze_stock(request: StockAnalysisRequest):
+async def analyze_stock(
+    request: StockAnalysisRequest,
+    http_request: Request,
+    response: Response,
+    x_request_priority: Optional[str] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None)
+):
+    # Scripts and batch jobs send "X-Request-Priority: background" so they
+    # cannot eat into the NewsAPI budget reserved for interactive users
+    priority = (x_request_priority or PRIORITY_INTERACTIVE).lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid X-Request-Priority: {x_request_priority}")
+    
+    # Admins send "X-Profile: <PROFILE_ADMIN_TOKEN>" to capture a profile of this request
+    profile = None
+    if profiler.enabled and profiler.should_profile(x_profile):
+        profile, profile_token = profiler.start(f"POST /api/analyze {request.ticker}")
+        response.headers["X-Profile-Id"] = profile.id
+
+    client = client_key(http_request.headers, http_request.client.host if http_request.client else None)
+    # Record an anonymized timeline of the request for replay when TRAFFIC_CAPTURE_PATH is set
+    captured = traffic_capture.begin() if traffic_capture.enabled else None
+    status = 200
+    try:
+        return await run_analysis(request, client, priority)
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    except asyncio.CancelledError:
+        # The client went away; nginx's "client closed request" keeps these out of the 200s
+        status = 499
+        raise
+    except Exception:
+        status = 500
+        raise
+    finally:
+        if captured is not None:
+            await traffic_capture.finish(captured, client, request.ticker, priority, status)
+        if profile is not None:
+            profiler.finish(profile, profile_token)
+
+async def run_analysis(request: StockAnalysisRequest, client: str, priority: str):
+    try:
+        with stage("admission"):
+            started = await admission_controller.acquire(client, priority)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
     try:
         # Fetch news articles
-        raw_articles = await get_news_articles(request.ticker)
+        with stage("fetch_news"):
+            raw_articles = await get_news_articles(request.ticker, priority=priority)
         
         # Debug logging
         print(f"Raw articles received: {len(raw_articles) if raw_articles else 0}")
@@ -60,59 +323,28 @@ async def analyze_stock(request: StockAnalysisRequest):
             raise HTTPException(status_code=404, detail="No news articles found for the given ticker")
             
         # Convert raw articles to NewsArticle objects
-        from datetime import datetime
-        articles = []
-        for idx, article in enumerate(raw_articles):
-            try:
-                # Debug logging
-                print(f"Processing article {idx}...")
-                print(f"Article data: {article}")
-                
-                # Extract data with fallbacks
-                title = article.get("title")
-                if not title:
-                    print(f"Warning: No title found for article {idx}")
-                    continue
-                    
-                description = article.get("description", "No description available")
-                source_name = article.get("source", {}).get("name", "Unknown Source")
-                url = article.get("url", "")
-                published_at_str = article.get("publishedAt")
-                
-                if not published_at_str:
-                    print(f"Warning: No publishedAt found for article {idx}")
-                    published_at = datetime.now()
-                else:
-                    try:
-                        published_at = datetime.strptime(published_at_str, "%Y-%m-%dT%H:%M:%SZ")
-                    except ValueError as e:
-                        print(f"Warning: Invalid date format for article {idx}: {e}")
-                        published_at = datetime.now()
-                
-                articles.append(
-                    NewsArticle(
-                        title=title,
-                        description=description,
-                        source=source_name,
-                        url=url,
-                        published_at=published_at
-                    )
-                )
-                print(f"Successfully processed article {idx}")
-            except Exception as e:
-                print(f"Error processing article {idx}: {str(e)}")
-                print(f"Article data that caused error: {article}")
-                continue
+        with stage("convert"):
+            articles = await to_news_articles(raw_articles)
         
         if not articles:
             raise HTTPException(status_code=404, detail="No valid articles found for processing")
             
-        # Analyze articles using ChatGPT
-        analysis_results = await analyze_articles(articles)
+        # Reuse stored analyses and only send unseen articles to ChatGPT
+        with stage("analyze"):
+            analysis_results, added = await analyze_with_store(request.ticker, articles)
+        annotate(articles=len(articles), new_analyses=len(added))
         
         # Generate final report
-        report = await generate_report(request.ticker, articles, analysis_results)
+        with stage("report"):
+            report = await generate_report(request.ticker, articles, analysis_results)
+        
+        # Push freshly analyzed articles to WebSocket subscribers of this ticker
+        if added:
+            with stage("publish"):
+                ticker_hub.publish(request.ticker, build_update(request.ticker, added, report))
         
         return report
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission_controller.release(started)
@@ -1,12 +1,28 @@
-from pydantic import BaseModel
+import re
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
 from datetime import datetime
 
+# Tickers end up in cache keys and file names, so only plain symbols are accepted
+TICKER_PATTERN = re.compile(r"^[A-Z][A-Z0-9.\-]{0,9}$")
+
+def normalize_ticker(value: str) -> str:
+    """Upper-case a ticker symbol, raising ValueError unless it is a plain symbol like AAPL or BRK.B."""
+    ticker = value.strip().upper()
+    if not TICKER_PATTERN.fullmatch(ticker):
+        raise ValueError(f"Invalid ticker: {value!r}")
+    return ticker
+
 class StockAnalysisRequest(BaseModel):
     ticker: str
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
 
+    @field_validator("ticker")
+    @classmethod
+    def check_ticker(cls, value: str) -> str:
+        return normalize_ticker(value)
+
 class NewsArticle(BaseModel):
     title: str
     description: str
@@ -0,0 +1,280 @@
+"""Admission control for the analysis pipeline.
+
+Each ``/api/analyze`` call can fan out into dozens of OpenAI requests, so the
+number of pipelines running at once is capped. Requests beyond the cap wait
+in a bounded priority queue (interactive ahead of background) with a
+deadline. Requests are refused early with 503 and ``Retry-After`` when the
+queue is full, or when the predicted wait (queue position times the recent
+mean pipeline duration) would blow the deadline. Each client also has a
+token bucket, so one misbehaving caller gets 429s instead of filling the
+queue. Clients are identified by network address only: a forwarded address
+is believed only when the request comes through a proxy listed in
+TRUSTED_PROXIES, so a caller cannot pick a fresh identity per request. In
+multi-worker mode the per-client limit is enforced across workers
+with sliding-window counters in shared state; the concurrency cap and queue
+stay per worker.
+"""
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .quota_service import PRIORITY_INTERACTIVE
+from .shared_state import shared_state
+
+ANALYZE_MAX_CONCURRENCY = int(os.getenv("ANALYZE_MAX_CONCURRENCY", "4"))
+ANALYZE_QUEUE_SIZE = int(os.getenv("ANALYZE_QUEUE_SIZE", "32"))
+ANALYZE_QUEUE_TIMEOUT = float(os.getenv("ANALYZE_QUEUE_TIMEOUT", "30"))
+ANALYZE_RATE_PER_MINUTE = float(os.getenv("ANALYZE_RATE_PER_MINUTE", "20"))
+ANALYZE_BURST = int(os.getenv("ANALYZE_BURST", "5"))
+# Comma-separated addresses or CIDR ranges of reverse proxies whose X-Forwarded-For is trusted
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+
+# Starting estimate of one pipeline run, refined by an EWMA of observed durations
+INITIAL_SERVICE_TIME = 10.0
+SERVICE_TIME_ALPHA = 0.2
+MAX_TRACKED_CLIENTS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Global concurrency cap with per-client rate limits and a bounded priority wait queue."""
+
+    def __init__(
+        self,
+        max_concurrency: int = ANALYZE_MAX_CONCURRENCY,
+        queue_size: int = ANALYZE_QUEUE_SIZE,
+        queue_timeout: float = ANALYZE_QUEUE_TIMEOUT,
+        rate_per_minute: float = ANALYZE_RATE_PER_MINUTE,
+        burst: int = ANALYZE_BURST,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate_per_second = rate_per_minute / 60
+        self.burst = burst
+        self.service_time = INITIAL_SERVICE_TIME
+        self._active = 0
+        self._queued = 0
+        self._waiters: List[List[Any]] = []
+        self._sequence = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._stats = {
+            "admitted": 0,
+            "admitted_after_wait": 0,
+            "rejected_rate_limited": 0,
+            "rejected_queue_full": 0,
+            "rejected_predicted_wait": 0,
+            "rejected_deadline": 0,
+        }
+        self._total_wait = 0.0
+
+    async def _check_rate(self, client: Optional[str]) -> None:
+        if self.rate_per_second <= 0 or client is None:
+            return
+        if shared_state.shared:
+            allowed, retry_after = await self._take_shared(client)
+        else:
+            allowed, retry_after = self._take_local(client)
+        if not allowed:
+            self._stats["rejected_rate_limited"] += 1
+            raise AdmissionRejected(429, "Rate limit exceeded for this client", retry_after)
+
+    async def _take_shared(self, client: str) -> Tuple[bool, float]:
+        """
+        Sliding-window limit shared by all workers: at most ``burst`` requests per
+        window, the time it takes the token bucket to refill the burst.
+        """
+        window = self.burst / self.rate_per_second
+        now = time.time()
+        index, elapsed = divmod(now, window)
+        current = await shared_state.incr(f"rate:{client}:{int(index)}", ttl=2 * window)
+        previous = await shared_state.count(f"rate:{client}:{int(index) - 1}")
+        # Weight the previous window by how much of it still overlaps the sliding window
+        estimate = previous * (1 - elapsed / window) + current
+        if estimate <= self.burst:
+            return True, 0.0
+        return False, window - elapsed
+
+    def _take_local(self, client: str) -> Tuple[bool, float]:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_second, self.burst)
+            self._buckets[client] = bucket
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take()
+
+    def _position(self, rank: int) -> int:
+        """1-based queue position a new waiter of this rank would take."""
+        ahead = sum(1 for w_rank, _, fut in self._waiters if w_rank <= rank and not fut.done())
+        return ahead + 1
+
+    def predicted_wait(self, position: int) -> float:
+        return math.ceil(position / self.max_concurrency) * self.service_time
+
+    async def acquire(self, client: Optional[str], priority: str = PRIORITY_INTERACTIVE) -> float:
+        """
+        Wait for a pipeline slot. Returns the start time to pass to ``release``.
+        
+        Internal callers that are capped elsewhere (WebSocket producers) pass no
+        client and skip the per-client rate limit.
+        """
+        await self._check_rate(client)
+
+        if self._active < self.max_concurrency and self._queued == 0:
+            self._active += 1
+            self._stats["admitted"] += 1
+            return time.monotonic()
+
+        if self._queued >= self.queue_size:
+            self._stats["rejected_queue_full"] += 1
+            raise AdmissionRejected(503, "Server is busy, analysis queue is full", self.predicted_wait(self._queued + 1))
+
+        rank = 0 if priority == PRIORITY_INTERACTIVE else 1
+        predicted = self.predicted_wait(self._position(rank))
+        if predicted > self.queue_timeout:
+            self._stats["rejected_predicted_wait"] += 1
+            raise AdmissionRejected(503, "Server is busy, predicted wait exceeds the deadline", predicted)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [rank, next(self._sequence), future])
+        self._queued += 1
+        enqueued = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we gave up; hand it back
+                self.release(time.monotonic(), record=False)
+            else:
+                future.cancel()
+                self._queued -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._stats["rejected_deadline"] += 1
+            raise AdmissionRejected(503, "Server is busy, timed out waiting for an analysis slot", self.predicted_wait(self._queued + 1))
+
+        self._stats["admitted"] += 1
+        self._stats["admitted_after_wait"] += 1
+        self._total_wait += time.monotonic() - enqueued
+        return time.monotonic()
+
+    def release(self, started: float, record: bool = True) -> None:
+        """Free a slot taken by ``acquire`` and hand it to the next live waiter."""
+        if record:
+            duration = time.monotonic() - started
+            if duration > 0:
+                self.service_time += SERVICE_TIME_ALPHA * (duration - self.service_time)
+        self._active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._queued -= 1
+            self._active += 1
+            future.set_result(None)
+            break
+
+    def metrics(self) -> Dict[str, Any]:
+        waited = self._stats["admitted_after_wait"]
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._queued,
+            "queue_size": self.queue_size,
+            "queue_timeout_s": self.queue_timeout,
+            "service_time_ewma_s": round(self.service_time, 3),
+            "predicted_wait_s": round(self.predicted_wait(self._queued + 1), 3) if self._queued else 0.0,
+            "mean_queue_wait_s": round(self._total_wait / waited, 3) if waited else 0.0,
+            "rate_limiter": "sliding_window" if shared_state.shared else "token_bucket",
+            "tracked_clients": len(self._buckets),
+            **self._stats,
+        }
+
+
+def parse_networks(spec: str) -> List[Any]:
+    """Parse a comma-separated list of addresses and CIDR ranges, ignoring invalid entries."""
+    networks = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            logging.warning(f"Ignoring invalid TRUSTED_PROXIES entry: {part}")
+    return networks
+
+
+_trusted_proxies = parse_networks(TRUSTED_PROXIES)
+
+
+def _is_trusted(address: str, networks: List[Any]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_key(headers, client_host: Optional[str], trusted_proxies: Optional[List[Any]] = None) -> str:
+    """
+    Identify the caller by network address.
+    
+    The peer address is used unless it is a trusted proxy. Then X-Forwarded-For is
+    read from the right, since each proxy appends the address it saw: the first
+    hop that is not itself a trusted proxy is the client. Hops further left were
+    supplied by the client and are ignored.
+    """
+    networks = _trusted_proxies if trusted_proxies is None else trusted_proxies
+    address = client_host or "unknown"
+    if networks and _is_trusted(address, networks):
+        hops = [hop.strip() for value in headers.getlist("x-forwarded-for") for hop in value.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            address = hop
+            if not _is_trusted(hop, networks):
+                break
+    return f"ip:{address}"
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,112 @@
+"""Durable, append-only log of every analysis, one file per ticker.
+
+The in-memory article store is capped per ticker, lost on restart and
+private to each worker, so bulk exports read this log instead. Each newly
+analyzed article is appended as one JSON line to ``<ticker>.ndjson`` in
+ANALYSIS_ARCHIVE_DIR (next to the rollup files by default). A batch is a
+single O_APPEND write, so several workers can share the directory.
+
+The log holds each article once: the pipeline archives only the entries the
+rollups counted for the first time, so readers stream it without tracking
+what they have already yielded.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .compact_store import StoredEntry, from_epoch
+from .rollup_service import ROLLUP_DIR
+from ..models import TICKER_PATTERN
+
+ANALYSIS_ARCHIVE_DIR = os.getenv("ANALYSIS_ARCHIVE_DIR", ROLLUP_DIR)
+
+
+def to_record(entry: StoredEntry) -> Dict[str, Any]:
+    article, analysis = entry
+    return {
+        "published_ts": article.published_ts,
+        "source": article.source,
+        "title": article.title,
+        "description": article.description,
+        "url": article.url,
+        "summary": analysis.summary,
+        "sentiment": analysis.sentiment,
+        "sentiment_score": analysis.sentiment_score,
+        "key_takeaways": list(analysis.key_takeaways),
+        "significant_quotes": list(analysis.significant_quotes),
+    }
+
+
+class AnalysisArchive:
+    """Per-ticker NDJSON files of analyzed articles, appended to and streamed back."""
+
+    def __init__(self, directory: str = ANALYSIS_ARCHIVE_DIR):
+        self.directory = directory
+        self.appended = 0
+        self.errors = 0
+
+    def _path(self, ticker: str) -> str:
+        if not TICKER_PATTERN.fullmatch(ticker):
+            raise ValueError(f"Invalid ticker: {ticker!r}")
+        return os.path.join(self.directory, f"{ticker}.ndjson")
+
+    def _append(self, ticker: str, data: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(ticker), "ab+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # Finish a line torn by a crash so this batch starts on its own line
+                    data = "\n" + data
+            f.write(data.encode("utf-8"))
+
+    async def add(self, ticker: str, entries: Iterable[StoredEntry]) -> int:
+        """Append articles not archived before; failures are logged, not raised, so analysis still succeeds."""
+        lines = [json.dumps(to_record(entry)) + "\n" for entry in entries]
+        if not lines:
+            return 0
+        try:
+            await asyncio.to_thread(self._append, ticker.upper(), "".join(lines))
+        except OSError as e:
+            self.errors += 1
+            logging.warning(f"Could not archive analyses for {ticker}: {e}")
+            return 0
+        self.appended += len(lines)
+        return len(lines)
+
+    def iter_records(
+        self, ticker: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield a ticker's archived analyses in the order they were made, optionally bounded by publish time.
+
+        Reads the file line by line without keeping state, so memory stays flat;
+        this blocks and should run off the event loop.
+        """
+        try:
+            f = open(self._path(ticker.upper()), encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    continue
+                ts = record["published_ts"]
+                if start_ts is not None and ts < start_ts:
+                    continue
+                if end_ts is not None and ts > end_ts:
+                    continue
+                record["published_at"] = from_epoch(record.pop("published_ts")).isoformat() + "Z"
+                yield record
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "appended": self.appended, "errors": self.errors}
+
+
+analysis_archive = AnalysisArchive()
@@ -1,83 +1,125 @@
+import logging
 import os
-from typing import List
-from openai import AsyncOpenAI
+from typing import TYPE_CHECKING, List, Optional, Tuple
 from ..models import NewsArticle, ArticleAnalysis
+from .validation_service import check_analyses, record_check, reask_prompt, merge_reask, validation_stats
+from .executor_service import cpu_executor
 
-client = AsyncOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    timeout=30.0,  # Set timeout to 30 seconds
-    max_retries=2  # Allow 2 retries
-)
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-async def analyze_articles(articles: List[NewsArticle]) -> List[ArticleAnalysis]:
-    """Analyze news articles using ChatGPT API."""
+# Follow-up requests allowed for fields that could not be repaired locally
+LLM_REASK_ATTEMPTS = int(os.getenv("LLM_REASK_ATTEMPTS", "1"))
+
+_client: Optional["AsyncOpenAI"] = None
+
+def get_client() -> "AsyncOpenAI":
+    """Return the shared OpenAI client, importing openai and building it on first use."""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=30.0,  # Set timeout to 30 seconds
+            max_retries=2  # Allow 2 retries
+        )
+    return _client
+
+def client_ready() -> bool:
+    return _client is not None
+
+async def _complete(messages: List[dict]) -> str:
+    """Send a chat completion request and return the response text."""
+    response = await get_client().chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=messages,
+        temperature=0.3,
+        response_format={"type": "json_object"}
+    )
+    
+    # Parse the response with proper error handling
+    if not response or not response.choices:
+        raise ValueError("Empty response from ChatGPT API")
+        
+    analysis_text = response.choices[0].message.content
+    if not analysis_text:
+        raise ValueError("Empty content in ChatGPT response")
+    return analysis_text
+
+def _messages(article: NewsArticle) -> List[dict]:
+    """Build the ChatGPT request for one article."""
+    # Prepare prompt for ChatGPT
+    prompt = f"""
+    Analyze this financial news article and return a JSON response in the following format:
+    {{
+        "summary": "Brief summary of the article",
+        "sentiment": "positive/neutral/negative",
+        "sentiment_score": 0.0,
+        "key_takeaways": ["point 1", "point 2", "point 3"],
+        "significant_quotes": ["quote 1", "quote 2"]
+    }}
+
+    Article to analyze:
+    Title: {article.title}
+    Description: {article.description}
+    Source: {article.source}
+    """
+    
+    return [
+        {"role": "system", "content": "You are an expert financial analyst. Respond only with valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def _reask(messages: List[dict], analysis_text: str, repaired: dict, invalid: List[str]) -> ArticleAnalysis:
+    """Re-ask only for the fields that could not be repaired; raises if they stay invalid."""
+    for _ in range(LLM_REASK_ATTEMPTS):
+        logging.info(f"Re-asking for invalid fields: {', '.join(invalid)}")
+        messages = messages + [
+            {"role": "assistant", "content": analysis_text},
+            {"role": "user", "content": reask_prompt(invalid)}
+        ]
+        try:
+            analysis_text = await _complete(messages)
+        except Exception:
+            # A failed re-ask call still leaves the article without a valid analysis
+            validation_stats.record("failed")
+            raise
+        analysis = merge_reask(repaired, invalid, analysis_text)
+        if analysis is not None:
+            validation_stats.record("reasked")
+            return analysis
     
-    analyses = []
+    validation_stats.record("failed")
+    raise ValueError(f"Invalid fields in response after repair: {', '.join(invalid)}")
+
+async def analyze_article_pairs(articles: List[NewsArticle]) -> List[Tuple[NewsArticle, ArticleAnalysis]]:
+    """
+    Analyze news articles, keeping each successful analysis paired with its article.
     
+    Responses are collected first and validated as one batch, which goes to the
+    CPU executor when it is large; only responses that fail validation are re-asked.
+    """
     print(f"Starting analysis of {len(articles)} articles")
+    responses = []
     for idx, article in enumerate(articles):
         print(f"Analyzing article {idx + 1}/{len(articles)}")
-        # Prepare prompt for ChatGPT
-        prompt = f"""
-        Analyze this financial news article and return a JSON response in the following format:
-        {{
-            "summary": "Brief summary of the article",
-            "sentiment": "positive/neutral/negative",
-            "sentiment_score": 0.0,
-            "key_takeaways": ["point 1", "point 2", "point 3"],
-            "significant_quotes": ["quote 1", "quote 2"]
-        }}
-
-        Article to analyze:
-        Title: {article.title}
-        Description: {article.description}
-        Source: {article.source}
-        """
-        
+        messages = _messages(article)
         try:
-            import json
-            response = await client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert financial analyst. Respond only with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            # Parse the response with proper error handling
-            if not response or not response.choices:
-                raise ValueError("Empty response from ChatGPT API")
-                
-            analysis_text = response.choices[0].message.content
-            if not analysis_text:
-                raise ValueError("Empty content in ChatGPT response")
-                
-            # Parse JSON with error handling
-            try:
-                analysis_data = json.loads(analysis_text)
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error: {str(e)}")
-                raise ValueError(f"Invalid JSON response: {analysis_text}")
-                
-            # Validate required fields
-            required_fields = ["summary", "sentiment", "sentiment_score", "key_takeaways", "significant_quotes"]
-            missing_fields = [field for field in required_fields if field not in analysis_data]
-            if missing_fields:
-                raise ValueError(f"Missing required fields in response: {', '.join(missing_fields)}")
-            
-            analyses.append(
-                ArticleAnalysis(
-                    summary=analysis_data["summary"],
-                    sentiment=analysis_data["sentiment"],
-                    sentiment_score=float(analysis_data["sentiment_score"]),
-                    key_takeaways=analysis_data["key_takeaways"],
-                    significant_quotes=analysis_data["significant_quotes"]
-                )
-            )
+            responses.append((article, messages, await _complete(messages)))
         except Exception as e:
             print(f"Error analyzing article: {str(e)}")
-            continue
     
-    return analyses
+    checked = await cpu_executor.run_batch(check_analyses, [text for _, _, text in responses])
+    
+    pairs = []
+    for (article, messages, analysis_text), result in zip(responses, checked):
+        analysis = record_check(result)
+        if analysis is None:
+            try:
+                analysis = await _reask(messages, analysis_text, result[1], result[2])
+            except Exception as e:
+                print(f"Error analyzing article: {str(e)}")
+                continue
+        pairs.append((article, analysis))
+    
+    return pairs
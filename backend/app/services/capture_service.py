@@ -0,0 +1,95 @@
+"""Capture anonymized request timelines from ``/api/analyze`` for replay.
+
+With ``TRAFFIC_CAPTURE_PATH`` set, every analyze request appends one JSON line:
+
+    {"ts": 1760000000.123, "client": "3f9a1c0b7e21", "ticker": "AAPL",
+     "priority": "interactive", "status": 200, "duration_ms": 812.4,
+     "stages": {"admission": 0.1, "fetch_news": 410.2, ...},
+     "articles": 20, "new_analyses": 3}
+
+The client is an HMAC of the rate-limit key (the client's address) under
+``TRAFFIC_CAPTURE_SALT``, so repeat visitors stay linkable within a capture
+without recording who they are. No headers, addresses or bodies are kept.
+Requests the client abandoned are recorded with status 499.
+Each line is a single O_APPEND write, so several workers can share the file.
+
+benchmarks/replay_traffic.py plays a capture back against a local instance.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Optional
+
+from .profiling_service import StageTimer, current_timer, start_timer, stop_timer
+
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")
+# Share one salt across workers to keep clients linkable across them; a random
+# per-process salt is used otherwise
+TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT", "")
+
+
+class CapturedRequest:
+    """An in-flight request being captured."""
+
+    __slots__ = ("ts", "started", "timer", "token")
+
+    def __init__(self):
+        self.ts = time.time()
+        self.started = time.perf_counter()
+        # Reuse the profiler's timer when this request is also being profiled
+        self.timer: Optional[StageTimer] = current_timer()
+        self.token = None
+        if self.timer is None:
+            self.timer, self.token = start_timer()
+
+
+class TrafficCapture:
+    """Appends anonymized request records to a JSONL file."""
+
+    def __init__(self, path: str = TRAFFIC_CAPTURE_PATH, salt: str = TRAFFIC_CAPTURE_SALT):
+        self.path = path
+        self._salt = (salt or secrets.token_hex(16)).encode()
+        self.captured = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def anonymize(self, client: str) -> str:
+        return hmac.new(self._salt, client.encode(), hashlib.sha256).hexdigest()[:12]
+
+    def begin(self) -> CapturedRequest:
+        return CapturedRequest()
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    async def finish(self, request: CapturedRequest, client: str, ticker: str, priority: str, status: int) -> None:
+        """Stop timing the request and append its record; capture failures are only logged."""
+        duration = time.perf_counter() - request.started
+        if request.token is not None:
+            stop_timer(request.token)
+        record = {
+            "ts": round(request.ts, 3),
+            "client": self.anonymize(client),
+            "ticker": ticker.upper(),
+            "priority": priority,
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "stages": {name: round(seconds * 1000, 1) for name, seconds in request.timer.stage_wall.items()},
+            **request.timer.annotations,
+        }
+        try:
+            await asyncio.to_thread(self._append, json.dumps(record) + "\n")
+            self.captured += 1
+        except OSError as e:
+            logging.warning(f"Could not write traffic capture to {self.path}: {e}")
+
+
+traffic_capture = TrafficCapture()
@@ -0,0 +1,167 @@
+"""Compact in-memory representation of analyzed articles.
+
+Pydantic models carry a per-instance ``__dict__`` and validation state, which
+adds up once tens of thousands of articles and analyses are held in process.
+The records here use ``__slots__``, interned source names and sentiment labels
+and epoch-second timestamps. They are turned back into the public models only
+at the response boundary, using ``model_construct`` so no re-validation runs.
+"""
+import calendar
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..models import ArticleAnalysis, NewsArticle
+
+ARTICLE_STORE_MAX_PER_TICKER = int(os.getenv("ARTICLE_STORE_MAX_PER_TICKER", "5000"))
+
+
+def to_epoch(value: datetime) -> int:
+    """Convert a datetime to epoch seconds, treating naive values as UTC."""
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple())
+    return int(value.timestamp())
+
+
+def from_epoch(ts: int) -> datetime:
+    """Convert epoch seconds back to the naive UTC datetime used by the API models."""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+class CompactArticle:
+    """Slotted, immutable-by-convention copy of a ``NewsArticle``."""
+
+    __slots__ = ("title", "description", "url", "source", "published_ts")
+
+    def __init__(self, title: str, description: str, url: str, source: str, published_ts: int):
+        self.title = title
+        self.description = description
+        self.url = url
+        self.source = sys.intern(source)
+        self.published_ts = published_ts
+
+    @classmethod
+    def from_model(cls, article: NewsArticle) -> "CompactArticle":
+        return cls(
+            title=article.title,
+            description=article.description,
+            url=article.url,
+            source=article.source,
+            published_ts=to_epoch(article.published_at),
+        )
+
+    def to_model(self) -> NewsArticle:
+        return NewsArticle.model_construct(
+            title=self.title,
+            description=self.description,
+            url=self.url,
+            published_at=from_epoch(self.published_ts),
+            source=self.source,
+        )
+
+
+class CompactAnalysis:
+    """Slotted copy of an ``ArticleAnalysis`` with an interned sentiment label."""
+
+    __slots__ = ("summary", "sentiment", "sentiment_score", "key_takeaways", "significant_quotes")
+
+    def __init__(
+        self,
+        summary: str,
+        sentiment: str,
+        sentiment_score: float,
+        key_takeaways: Tuple[str, ...],
+        significant_quotes: Tuple[str, ...],
+    ):
+        self.summary = summary
+        self.sentiment = sys.intern(sentiment)
+        self.sentiment_score = sentiment_score
+        self.key_takeaways = key_takeaways
+        self.significant_quotes = significant_quotes
+
+    @classmethod
+    def from_model(cls, analysis: ArticleAnalysis) -> "CompactAnalysis":
+        return cls(
+            summary=analysis.summary,
+            sentiment=analysis.sentiment,
+            sentiment_score=analysis.sentiment_score,
+            key_takeaways=tuple(analysis.key_takeaways),
+            significant_quotes=tuple(analysis.significant_quotes),
+        )
+
+    def to_model(self) -> ArticleAnalysis:
+        return ArticleAnalysis.model_construct(
+            summary=self.summary,
+            sentiment=self.sentiment,
+            sentiment_score=self.sentiment_score,
+            key_takeaways=list(self.key_takeaways),
+            significant_quotes=list(self.significant_quotes),
+        )
+
+
+StoredEntry = Tuple[CompactArticle, CompactAnalysis]
+
+
+def article_key(article) -> str:
+    """Identity of a ``NewsArticle`` or ``CompactArticle``: its URL, or its title when it has none."""
+    return article.url or article.title
+
+
+class ArticleStore:
+    """Per-ticker store of analyzed articles, deduplicated by ``article_key``.
+
+    Each ticker keeps at most ``max_per_ticker`` entries; the oldest inserted
+    entries are evicted first.
+    """
+
+    def __init__(self, max_per_ticker: int = ARTICLE_STORE_MAX_PER_TICKER):
+        self.max_per_ticker = max_per_ticker
+        self._entries: Dict[str, Dict[str, StoredEntry]] = {}
+
+    def add(
+        self, ticker: str, pairs: Iterable[Tuple[NewsArticle, ArticleAnalysis]]
+    ) -> List[StoredEntry]:
+        """Store analyzed articles for a ticker and return only the newly added entries."""
+        bucket = self._entries.setdefault(ticker.upper(), {})
+        added = []
+        for article, analysis in pairs:
+            key = article_key(article)
+            if key in bucket:
+                continue
+            entry = (CompactArticle.from_model(article), CompactAnalysis.from_model(analysis))
+            bucket[key] = entry
+            added.append(entry)
+
+        overflow = len(bucket) - self.max_per_ticker
+        if overflow > 0:
+            for key in list(bucket)[:overflow]:
+                del bucket[key]
+        return added
+
+    def contains(self, ticker: str, key: str) -> bool:
+        return key in self._entries.get(ticker.upper(), {})
+
+    def get(self, ticker: str, key: str) -> Optional[StoredEntry]:
+        return self._entries.get(ticker.upper(), {}).get(key)
+
+    def iter_entries(
+        self, ticker: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None
+    ) -> Iterator[StoredEntry]:
+        """Yield a ticker's entries in insertion order, optionally bounded by publish time."""
+        for entry in list(self._entries.get(ticker.upper(), {}).values()):
+            ts = entry[0].published_ts
+            if start_ts is not None and ts < start_ts:
+                continue
+            if end_ts is not None and ts > end_ts:
+                continue
+            yield entry
+
+    def tickers(self) -> List[str]:
+        return sorted(self._entries)
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._entries.values())
+
+
+article_store = ArticleStore()
@@ -0,0 +1,107 @@
+"""Run CPU-heavy batch stages off the event loop.
+
+Post-processing of large batches (screening provider results, converting raw
+articles, validating LLM responses) is plain CPU work that would otherwise
+delay every other request's I/O. ``run_batch`` splits such a batch across a
+process pool, or runs it inline when it is too small to repay the cost of
+pickling inputs and results (see benchmarks/bench_cpu_offload.py for the
+crossover).
+
+Batch functions must be top-level (picklable) and take and return plain data:
+``func(items, *args) -> list`` with one result per item, in order.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# "process", "thread" or "inline"
+CPU_EXECUTOR = os.getenv("CPU_EXECUTOR", "process").lower()
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Batches smaller than this run inline on the event loop. A full NewsAPI page
+# (100 articles) is where offloading screening and conversion starts to stall
+# the loop less than running them inline
+CPU_OFFLOAD_MIN_ITEMS = int(os.getenv("CPU_OFFLOAD_MIN_ITEMS", "100"))
+# "spawn" keeps workers clear of the parent's threads and open sockets
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+
+class CPUExecutor:
+    """Lazily created pool plus the inline/offload decision."""
+
+    def __init__(
+        self,
+        mode: str = CPU_EXECUTOR,
+        workers: int = CPU_POOL_WORKERS,
+        min_items: int = CPU_OFFLOAD_MIN_ITEMS,
+        start_method: str = CPU_POOL_START_METHOD,
+    ):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Invalid CPU_EXECUTOR: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.min_items = min_items
+        self.start_method = start_method
+        self._pool: Optional[Executor] = None
+        self._stats = {"inline_batches": 0, "inline_items": 0, "offloaded_batches": 0, "offloaded_items": 0, "pool_failures": 0}
+        self._offload_seconds = 0.0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "thread":
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+            else:
+                context = multiprocessing.get_context(self.start_method)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def should_offload(self, size: int) -> bool:
+        return self.mode != "inline" and size >= self.min_items
+
+    async def run_batch(self, func: Callable[..., List[Any]], items: Sequence[Any], *args: Any) -> List[Any]:
+        """Apply ``func`` to ``items`` in chunks on the pool, or inline for small batches."""
+        items = list(items)
+        if not self.should_offload(len(items)):
+            self._stats["inline_batches"] += 1
+            self._stats["inline_items"] += len(items)
+            return func(items, *args)
+
+        loop = asyncio.get_running_loop()
+        chunk_size = -(-len(items) // self.workers)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        started = time.perf_counter()
+        try:
+            pool = self._get_pool()
+            results = await asyncio.gather(*(loop.run_in_executor(pool, func, chunk, *args) for chunk in chunks))
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM-killed); rebuild the pool next time and finish this batch inline
+            logging.warning(f"CPU pool failed, running {func.__name__} inline: {e}")
+            self._stats["pool_failures"] += 1
+            self._pool = None
+            return func(items, *args)
+        self._offload_seconds += time.perf_counter() - started
+        self._stats["offloaded_batches"] += 1
+        self._stats["offloaded_items"] += len(items)
+        return [result for chunk in results for result in chunk]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "min_items": self.min_items,
+            "pool_started": self._pool is not None,
+            **self._stats,
+            "offload_seconds": round(self._offload_seconds, 3),
+        }
+
+
+cpu_executor = CPUExecutor()
@@ -0,0 +1,155 @@
+"""Streaming bulk export of stored articles and analyses.
+
+Rows are produced by generators straight from the analysis archive (every
+analysis ever made, not just those still held in memory) and encoded chunk
+by chunk, so memory use stays flat regardless of how many rows an export
+covers. CSV and NDJSON need only the standard library; Parquet needs the
+optional ``pyarrow`` package.
+"""
+import csv
+import io
+import json
+from datetime import datetime, time
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .analysis_archive import analysis_archive
+from .compact_store import to_epoch
+
+EXPORT_CHUNK_ROWS = 500
+
+FIELDS = [
+    "ticker",
+    "published_at",
+    "source",
+    "title",
+    "description",
+    "url",
+    "summary",
+    "sentiment",
+    "sentiment_score",
+    "key_takeaways",
+    "significant_quotes",
+]
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportUnavailableError(Exception):
+    """Raised when an export format's optional dependency is not installed."""
+
+
+def iter_rows(tickers: List[str], start=None, end=None) -> Iterator[Dict[str, Any]]:
+    """Yield one flat row per archived analysis, for the given tickers and publish dates."""
+    start_ts = to_epoch(datetime.combine(start, time.min)) if start else None
+    end_ts = to_epoch(datetime.combine(end, time.max)) if end else None
+    for ticker in tickers:
+        for record in analysis_archive.iter_records(ticker, start_ts, end_ts):
+            yield {field: ticker.upper() if field == "ticker" else record[field] for field in FIELDS}
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(rows: Iterable[Dict[str, Any]], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for chunk in _chunks(rows, chunk_rows):
+        for row in chunk:
+            # Lists are joined so each row stays one flat CSV record
+            row["key_takeaways"] = " | ".join(row["key_takeaways"])
+            row["significant_quotes"] = " | ".join(row["significant_quotes"])
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_ndjson(rows: Iterable[Dict[str, Any]], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    for chunk in _chunks(rows, chunk_rows):
+        yield "".join(json.dumps(row) + "\n" for row in chunk).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_parquet(rows: Iterable[Dict[str, Any]], chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailableError("Parquet export requires the pyarrow package")
+
+    schema = pa.schema([
+        ("ticker", pa.string()),
+        ("published_at", pa.timestamp("s", tz="UTC")),
+        ("source", pa.string()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("url", pa.string()),
+        ("summary", pa.string()),
+        ("sentiment", pa.string()),
+        ("sentiment_score", pa.float64()),
+        ("key_takeaways", pa.list_(pa.string())),
+        ("significant_quotes", pa.list_(pa.string())),
+    ])
+
+    def generate():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in _chunks(rows, chunk_rows):
+                for row in chunk:
+                    row["published_at"] = datetime.fromisoformat(row["published_at"].replace("Z", "+00:00"))
+                writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                yield sink.drain()
+        yield sink.drain()
+
+    return generate()
+
+
+def export_stream(fmt: str, tickers: List[str], start=None, end=None) -> Iterator[bytes]:
+    """Return a byte-chunk iterator for the export; raises ValueError for unknown formats."""
+    rows = iter_rows(tickers, start, end)
+    if fmt == "csv":
+        return stream_csv(rows)
+    if fmt == "ndjson":
+        return stream_ndjson(rows)
+    if fmt == "parquet":
+        return stream_parquet(rows)
+    raise ValueError(f"Unsupported export format: {fmt}")
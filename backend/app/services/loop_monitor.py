@@ -0,0 +1,184 @@
+"""Event loop health instrumentation.
+
+A heartbeat coroutine measures how late the loop wakes it up (loop lag), and a
+watchdog thread notices when the heartbeat is overdue. When the loop is stalled
+for longer than the slow-callback threshold, the watchdog captures the loop
+thread's stack and attributes the stall to the innermost running coroutine, so
+blocking calls inside request handlers show up by name.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+LOOP_SLOW_CALLBACK_MS = float(os.getenv("LOOP_SLOW_CALLBACK_MS", "100"))
+
+logger = logging.getLogger(__name__)
+
+
+def _coroutine_frames(frame) -> List[Any]:
+    """Return the coroutine frames on a thread stack, innermost first."""
+    frames = []
+    while frame is not None:
+        if frame.f_code.co_flags & (inspect.CO_COROUTINE | inspect.CO_ITERABLE_COROUTINE):
+            frames.append(frame)
+        frame = frame.f_back
+    return frames
+
+
+def _describe(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}.{name}"
+
+
+class LoopMonitor:
+    """Samples event loop lag and records stalls caused by slow callbacks."""
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL,
+        slow_callback_ms: float = LOOP_SLOW_CALLBACK_MS,
+        max_samples: int = 1000,
+        max_events: int = 50,
+        stack_limit: int = 40,
+    ):
+        self.interval = interval
+        self.slow_threshold = slow_callback_ms / 1000
+        self.stack_limit = stack_limit
+        self._lags = deque(maxlen=max_samples)
+        self._events = deque(maxlen=max_events)
+        self._by_coroutine: Counter = Counter()
+        self._sample_count = 0
+        self._max_lag = 0.0
+        self._slow_callbacks = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_beat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._open_event: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start sampling the running loop. Must be called from within the loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-monitor-heartbeat")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Loop monitor started (interval={self.interval}s, "
+            f"slow callback threshold={self.slow_threshold * 1000:.0f}ms)"
+        )
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_beat = time.monotonic()
+            self._sample_count += 1
+            self._lags.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+            event = self._open_event
+            if event is not None:
+                # The loop has recovered; record how long the stall actually lasted
+                event["duration_ms"] = round(lag * 1000, 1)
+                self._open_event = None
+
+    def _watch(self) -> None:
+        poll = max(self.slow_threshold / 4, 0.005)
+        while not self._stopped.wait(poll):
+            last_beat = self._last_beat
+            overdue = time.monotonic() - last_beat - self.interval
+            if overdue >= self.slow_threshold and self._reported_beat != last_beat:
+                self._reported_beat = last_beat
+                self._capture(overdue)
+
+    def _capture(self, overdue: float) -> None:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        coroutines = _coroutine_frames(frame)
+        offender = _describe(coroutines[0]) if coroutines else _describe(frame)
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+        event = {
+            "detected_at": datetime.now().isoformat(),
+            "coroutine": offender,
+            "coroutine_chain": [_describe(f) for f in coroutines],
+            "task": task.get_name() if task is not None else None,
+            "blocked_ms_at_detection": round(overdue * 1000, 1),
+            "duration_ms": None,
+            "stack": traceback.format_stack(frame, limit=self.stack_limit),
+        }
+        del frame
+        self._slow_callbacks += 1
+        self._by_coroutine[offender] += 1
+        self._events.append(event)
+        self._open_event = event
+        logger.warning(f"Event loop blocked for >{overdue * 1000:.0f}ms in {offender}")
+
+    def metrics(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+        if lags:
+            p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+            summary = {
+                "lag_last_ms": round(self._lags[-1] * 1000, 2),
+                "lag_mean_ms": round(statistics.fmean(lags) * 1000, 2),
+                "lag_p50_ms": round(statistics.median(lags) * 1000, 2),
+                "lag_p99_ms": round(p99 * 1000, 2),
+            }
+        else:
+            summary = {"lag_last_ms": None, "lag_mean_ms": None, "lag_p50_ms": None, "lag_p99_ms": None}
+        return {
+            "running": self.running,
+            "samples": self._sample_count,
+            "lag_max_ms": round(self._max_lag * 1000, 2),
+            **summary,
+            "slow_callbacks": self._slow_callbacks,
+            "slow_callbacks_by_coroutine": dict(self._by_coroutine.most_common(10)),
+        }
+
+    def slow_callbacks(self) -> List[Dict[str, Any]]:
+        return list(reversed(self._events))
+
+
+loop_monitor = LoopMonitor()
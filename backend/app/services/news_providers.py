@@ -0,0 +1,278 @@
+"""News provider backends.
+
+Every provider returns articles in the NewsAPI ``everything`` shape
+(``source``/``title``/``description``/``url``/``publishedAt``) so the merge,
+whitelist and conversion code downstream does not care where an article
+came from.
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .quota_service import QuotaExceededError, quota_manager
+from .symbol_service import build_query, relevance_score
+
+if TYPE_CHECKING:
+    import aiohttp
+
+NEWS_API_KEY = os.getenv("NEWS_API_KEY")
+NEWS_API_BASE_URL = os.getenv("NEWS_API_BASE_URL", "https://newsapi.org/v2/everything")
+NEWS_PROVIDER_TIMEOUT = float(os.getenv("NEWS_PROVIDER_TIMEOUT", "15"))
+NEWS_FIXTURE_PATH = os.getenv("NEWS_FIXTURE_PATH", "")
+
+PUBLISHED_AT_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# RSS/Atom feeds published by the whitelisted outlets. "{ticker}" is filled in
+# for ticker-specific feeds; the rest are general market feeds that get
+# filtered down to items mentioning the ticker.
+RSS_FEEDS = {
+    "Yahoo Finance": "https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US",
+    "CNBC": "https://search.cnbc.com/rs/search/combinedcms/view.xml?partnerId=wrss01&id=10001147",
+    "MarketWatch": "https://feeds.content.dowjones.io/public/rss/mw_topstories",
+}
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+
+_session: Optional["aiohttp.ClientSession"] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_session() -> "aiohttp.ClientSession":
+    """Return the shared HTTP session, importing aiohttp and creating it on first use.
+
+    Must be called from within the running event loop.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        if _session is not None and not _session.closed:
+            _retire_session(_session, _session_loop)
+        import aiohttp
+        _session = aiohttp.ClientSession()
+        _session_loop = loop
+    return _session
+
+
+def _retire_session(session: "aiohttp.ClientSession", loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Release a session created on another event loop, where it cannot be awaited from."""
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+        return
+    logging.warning("Closing an HTTP session left open by a stopped event loop; call close_session() before it exits")
+    connector = session.connector
+    session.detach()
+    if connector is not None:
+        # The synchronous part of connector.close(): drops pooled connections without awaiting them
+        connector._close()
+
+
+async def close_session() -> None:
+    global _session, _session_loop
+    if _session is not None and not _session.closed and _session_loop is asyncio.get_running_loop():
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+def format_published_at(value: datetime) -> str:
+    """Render a datetime in the NewsAPI ``publishedAt`` format (UTC, second precision)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(PUBLISHED_AT_FORMAT)
+
+
+class NewsProvider(abc.ABC):
+    """Base class for news backends."""
+
+    name = "base"
+    # Metered providers spend upstream quota on every fetch
+    metered = False
+
+    def __init__(self, timeout: float = NEWS_PROVIDER_TIMEOUT):
+        self.timeout = timeout
+
+    @abc.abstractmethod
+    async def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Return raw articles for the ticker in NewsAPI shape."""
+
+
+class NewsAPIProvider(NewsProvider):
+    """The NewsAPI ``everything`` endpoint."""
+
+    name = "newsapi"
+    metered = True
+
+    async def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        if not NEWS_API_KEY:
+            raise ValueError("NEWS_API_KEY environment variable is not set")
+
+        params = {
+            "q": build_query(ticker),
+            "apiKey": NEWS_API_KEY,
+            "language": "en",
+            "sortBy": "publishedAt",
+            "pageSize": 100,  # Maximum allowed by News API
+            "from": start_date.strftime("%Y-%m-%d"),
+            "to": end_date.strftime("%Y-%m-%d")
+        }
+
+        session = get_session()
+        async with session.get(NEWS_API_BASE_URL, params=params, timeout=self.timeout) as response:
+            if response.status == 429:
+                await asyncio.to_thread(quota_manager.mark_exhausted)
+                raise QuotaExceededError("News API quota exhausted")
+            if response.status != 200:
+                error_text = await response.text()
+                raise ValueError(f"News API error: {error_text}")
+
+            data = await response.json()
+
+            if data["status"] != "ok":
+                raise ValueError(f"News API error: {data.get('message', 'Unknown error')}")
+
+            return data["articles"]
+
+
+class RSSProvider(NewsProvider):
+    """RSS/Atom feeds from the whitelisted outlets."""
+
+    name = "rss"
+
+    def __init__(self, timeout: float = NEWS_PROVIDER_TIMEOUT, feeds: Optional[Dict[str, str]] = None):
+        super().__init__(timeout)
+        self.feeds = feeds if feeds is not None else RSS_FEEDS
+
+    async def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        session = get_session()
+        results = await asyncio.gather(
+            *(self._fetch_feed(session, outlet, url, ticker) for outlet, url in self.feeds.items()),
+            return_exceptions=True
+        )
+
+        articles = []
+        for outlet, result in zip(self.feeds, results):
+            if isinstance(result, Exception):
+                logging.warning(f"RSS feed for {outlet} failed: {result}")
+                continue
+            articles.extend(result)
+        return articles
+
+    async def _fetch_feed(self, session, outlet: str, url: str, ticker: str) -> List[Dict[str, Any]]:
+        ticker_specific = "{ticker}" in url
+        async with session.get(url.format(ticker=ticker), timeout=self.timeout) as response:
+            if response.status != 200:
+                raise ValueError(f"HTTP {response.status}")
+            body = await response.read()
+
+        articles = parse_feed(body, outlet)
+        if not ticker_specific:
+            pattern = re.compile(rf"(?<![A-Za-z0-9]){re.escape(ticker)}(?![A-Za-z0-9])")
+            articles = [a for a in articles if self._mentions(ticker, a, pattern)]
+        return articles
+
+    @staticmethod
+    def _mentions(ticker: str, article: Dict[str, Any], pattern) -> bool:
+        score = relevance_score(ticker, article)
+        if score is not None:
+            return score > 0
+        # Tickers missing from the symbol index fall back to a bare ticker match
+        return bool(pattern.search(article["title"]) or pattern.search(article["description"] or ""))
+
+
+def parse_feed(body: bytes, outlet: str) -> List[Dict[str, Any]]:
+    """Parse an RSS 2.0 or Atom document into NewsAPI-shaped articles."""
+    root = ET.fromstring(body)
+    source = {"id": None, "name": outlet}
+    articles = []
+
+    for item in root.iter("item"):
+        title = (item.findtext("title") or "").strip()
+        link = (item.findtext("link") or "").strip()
+        pub_date = item.findtext("pubDate")
+        if not title or not link or not pub_date:
+            continue
+        try:
+            published_at = parsedate_to_datetime(pub_date)
+        except (TypeError, ValueError):
+            continue
+        articles.append({
+            "source": source,
+            "title": title,
+            "description": (item.findtext("description") or "").strip(),
+            "url": link,
+            "publishedAt": format_published_at(published_at),
+        })
+
+    for entry in root.iter(f"{ATOM_NS}entry"):
+        title = (entry.findtext(f"{ATOM_NS}title") or "").strip()
+        link_el = entry.find(f"{ATOM_NS}link")
+        link = link_el.get("href", "").strip() if link_el is not None else ""
+        stamp = entry.findtext(f"{ATOM_NS}published") or entry.findtext(f"{ATOM_NS}updated")
+        if not title or not link or not stamp:
+            continue
+        try:
+            published_at = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        articles.append({
+            "source": source,
+            "title": title,
+            "description": (entry.findtext(f"{ATOM_NS}summary") or "").strip(),
+            "url": link,
+            "publishedAt": format_published_at(published_at),
+        })
+
+    return articles
+
+
+class FileProvider(NewsProvider):
+    """Articles from a local JSON fixture, for tests and offline runs.
+
+    The file holds either a NewsAPI response (``{"articles": [...]}``) or a
+    mapping of ticker to a list of articles.
+    """
+
+    name = "file"
+
+    def __init__(self, timeout: float = NEWS_PROVIDER_TIMEOUT, path: str = NEWS_FIXTURE_PATH):
+        super().__init__(timeout)
+        self.path = path
+
+    async def fetch(self, ticker: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        if not self.path:
+            raise ValueError("NEWS_FIXTURE_PATH environment variable is not set")
+        data = await asyncio.to_thread(self._load)
+        if "articles" in data:
+            return data["articles"]
+        return data.get(ticker.upper(), [])
+
+    def _load(self) -> Dict[str, Any]:
+        with open(self.path) as f:
+            return json.load(f)
+
+
+PROVIDERS = {
+    NewsAPIProvider.name: NewsAPIProvider,
+    RSSProvider.name: RSSProvider,
+    FileProvider.name: FileProvider,
+}
+
+
+def build_providers(names: List[str]) -> List[NewsProvider]:
+    """Instantiate providers by name, e.g. from the NEWS_PROVIDERS setting."""
+    providers = []
+    for name in names:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown news provider: {name}")
+        providers.append(PROVIDERS[name]())
+    return providers
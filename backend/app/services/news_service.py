@@ -1,12 +1,16 @@
-from typing import List, Dict, Any
-import aiohttp
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
 import os
-from dotenv import load_dotenv
+import time
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
-
-load_dotenv()
+from urllib.parse import urlsplit, urlunsplit
+from .news_providers import NewsProvider, build_providers
+from .quota_service import PRIORITY_INTERACTIVE, quota_manager
+from .symbol_service import is_relevant
+from .executor_service import cpu_executor
+from .shared_state import shared_state
 
 def setup_logging():
     """Configure logging for the news service."""
@@ -15,10 +19,18 @@ def setup_logging():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
-setup_logging()
+NEWS_PROVIDERS = os.getenv("NEWS_PROVIDERS", "newsapi,rss")
+# Return as soon as this many good articles are in hand (0 waits for every provider)
+NEWS_FIRST_N = int(os.getenv("NEWS_FIRST_N", "0"))
+# While the NewsAPI budget is low, cached results younger than this are served instead
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "900"))
+NEWS_CACHE_MAX_TICKERS = 512
+# How long a fetch for a ticker holds its single-flight lock
+NEWS_FETCH_LOCK_TTL = float(os.getenv("NEWS_FETCH_LOCK_TTL", "30"))
 
-NEWS_API_KEY = os.getenv("NEWS_API_KEY")
-NEWS_API_BASE_URL = "https://newsapi.org/v2/everything"
+# Last good merged result per (ticker, days) with its wall-clock fetch time, used to
+# degrade gracefully on quota pressure; mirrored in shared state for the other workers
+_recent_results: "OrderedDict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
 
 # Whitelist of trusted financial news sources
 WHITELISTED_SOURCES = {
@@ -88,72 +100,215 @@ def is_whitelisted_source(source: Dict[str, Any]) -> bool:
     logging.warning(f"Rejected non-whitelisted source: {source_name} ({source_url})")
     return False
 
-async def get_news_articles(ticker: str, days: int = 30) -> List[Dict[str, Any]]:
+def dedupe_key(url: str) -> str:
+    """Normalize an article URL so the same story from two providers merges."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower().removeprefix("www."), path, parts.query, ""))
+
+def parse_published_at(value: str) -> datetime:
+    """Parse a NewsAPI ``publishedAt`` timestamp into a naive UTC datetime."""
+    published_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if published_at.tzinfo is not None:
+        published_at = published_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return published_at
+
+def is_good_article(article: Dict[str, Any], start_date: datetime, end_date: datetime) -> bool:
+    """Check that an article has a URL, falls in the date range and comes from a whitelisted source."""
+    if not article.get("url") or not article.get("publishedAt"):
+        return False
+    try:
+        published_at = parse_published_at(article["publishedAt"])
+    except ValueError:
+        logging.info(f"Skipped article with invalid date: {article['publishedAt']}")
+        return False
+    if not start_date <= published_at <= end_date:
+        logging.info(f"Skipped article due to date range: {published_at}")
+        return False
+    source = article.get("source") or {}
+    if not is_whitelisted_source(source):
+        logging.info(f"Skipped article from non-whitelisted source: {source.get('name', 'Unknown')}")
+        return False
+    return True
+
+def screen_articles(
+    articles: List[Dict[str, Any]],
+    ticker: str,
+    start_date: datetime,
+    end_date: datetime
+) -> List[str]:
+    """
+    Check a batch of provider articles; runs on the CPU executor for large batches.
+    
+    Returns:
+        List[str]: One verdict per article: "ok", "bad" (fails is_good_article)
+        or "irrelevant" (not about the ticker's company)
+    """
+    verdicts = []
+    for article in articles:
+        if not is_good_article(article, start_date, end_date):
+            verdicts.append("bad")
+        elif not is_relevant(ticker, article):
+            verdicts.append("irrelevant")
+        else:
+            verdicts.append("ok")
+    return verdicts
+
+async def _fetch_from(provider: NewsProvider, ticker: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+    try:
+        return await asyncio.wait_for(provider.fetch(ticker, start_date, end_date), provider.timeout)
+    except asyncio.TimeoutError:
+        raise Exception(f"Timeout after {provider.timeout}s")
+
+def _cache_result(key: Tuple[str, int], articles: List[Dict[str, Any]], fetched_at: Optional[float] = None) -> None:
+    _recent_results[key] = (fetched_at or time.time(), articles)
+    _recent_results.move_to_end(key)
+    while len(_recent_results) > NEWS_CACHE_MAX_TICKERS:
+        _recent_results.popitem(last=False)
+
+def _shared_key(key: Tuple[str, int]) -> str:
+    return f"news:{key[0]}:{key[1]}"
+
+async def _load_result(key: Tuple[str, int]) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+    """Newest cached result for the key from this worker or, in multi-worker mode, any worker."""
+    cached = _recent_results.get(key)
+    if shared_state.shared:
+        entry = (await shared_state.get_json([_shared_key(key)])).get(_shared_key(key))
+        if entry and (cached is None or entry["fetched_at"] > cached[0]):
+            _cache_result(key, entry["articles"], entry["fetched_at"])
+            cached = _recent_results[key]
+    return cached
+
+async def _store_result(key: Tuple[str, int], articles: List[Dict[str, Any]]) -> None:
+    _cache_result(key, articles)
+    fetched_at, _ = _recent_results[key]
+    await shared_state.set_json({_shared_key(key): {"fetched_at": fetched_at, "articles": articles}})
+
+async def get_news_articles(
+    ticker: str,
+    days: int = 30,
+    providers: Optional[List[NewsProvider]] = None,
+    first_n: int = NEWS_FIRST_N,
+    priority: str = PRIORITY_INTERACTIVE
+) -> List[Dict[str, Any]]:
     """
-    Fetch news articles for a given stock ticker from the News API.
+    Fetch news articles for a given stock ticker from every configured provider in parallel.
+    
+    Metered providers (NewsAPI) only run if the quota manager admits the request
+    at the given priority. When the budget is low a fresh cached result is served
+    instead, and when a metered provider is refused, the last cached result for the
+    ticker is merged in so the response degrades rather than fails.
     
     Args:
         ticker (str): Stock ticker symbol
         days (int): Number of days to look back for news articles (default: 30)
+        providers (List[NewsProvider]): Providers to query (default: from NEWS_PROVIDERS)
+        first_n (int): Return early once this many good articles are merged (0 waits for all)
+        priority (str): "interactive" or "background", for quota admission
         
     Returns:
-        List[Dict[str, Any]]: List of filtered news articles from whitelisted sources
+        List[Dict[str, Any]]: Filtered news articles from whitelisted sources, deduplicated by URL
     """
-    if not NEWS_API_KEY:
-        raise ValueError("NEWS_API_KEY environment variable is not set")
+    if providers is None:
+        providers = build_providers(NEWS_PROVIDERS.split(","))
+    
+    cache_key = (ticker.upper(), days)
+    cached = await _load_result(cache_key)
+    if any(p.metered for p in providers):
+        if cached and time.time() - cached[0] < NEWS_CACHE_TTL and await asyncio.to_thread(quota_manager.is_low):
+            logging.info(f"NewsAPI budget is low, serving cached articles for {ticker}")
+            return cached[1]
     
+    # Concurrent requests for the same ticker, in this worker or another, share one fetch
+    requested_at = time.time()
+    async with shared_state.lock(_shared_key(cache_key), ttl=NEWS_FETCH_LOCK_TTL, wait=NEWS_FETCH_LOCK_TTL) as waited:
+        if waited:
+            latest = await _load_result(cache_key)
+            if latest and latest[0] >= requested_at:
+                logging.info(f"Serving articles for {ticker} fetched while this request waited")
+                return latest[1]
+            cached = latest or cached
+        return await _fetch_articles(ticker, days, providers, first_n, priority, cache_key, cached)
+
+async def _fetch_articles(
+    ticker: str,
+    days: int,
+    providers: List[NewsProvider],
+    first_n: int,
+    priority: str,
+    cache_key: Tuple[str, int],
+    cached: Optional[Tuple[float, List[Dict[str, Any]]]]
+) -> List[Dict[str, Any]]:
+    """Query the providers, merge their results and update the cache; see get_news_articles."""
     # Calculate date range
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
-    params = {
-        "q": ticker,
-        "apiKey": NEWS_API_KEY,
-        "language": "en",
-        "sortBy": "publishedAt",
-        "pageSize": 100,  # Maximum allowed by News API
-        "from": start_date.strftime("%Y-%m-%d"),
-        "to": end_date.strftime("%Y-%m-%d")
+    admitted = []
+    refused = []
+    for provider in providers:
+        if provider.metered and not await quota_manager.acquire(priority):
+            logging.warning(f"Skipping {provider.name} for {ticker}: {priority} quota exhausted")
+            refused.append(provider)
+        else:
+            admitted.append(provider)
+    
+    tasks = {
+        asyncio.create_task(_fetch_from(provider, ticker, start_date, end_date)): provider
+        for provider in admitted
     }
+    pending = set(tasks)
+    merged: Dict[str, Dict[str, Any]] = {}
+    errors = []
     
     try:
-        async with aiohttp.ClientSession() as session: 
-            async with session.get(NEWS_API_BASE_URL, params=params, timeout=30) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise ValueError(f"News API error: {error_text}")
-                
-                data = await response.json()
-                
-                if data["status"] != "ok":
-                    raise ValueError(f"News API error: {data.get('message', 'Unknown error')}")
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = tasks[task]
+                try:
+                    results = task.result()
+                except Exception as e:
+                    logging.warning(f"News provider {provider.name} failed for {ticker}: {e}")
+                    errors.append(f"{provider.name}: {e}")
+                    continue
                 
-                # Filter articles by whitelisted sources and date range
-                articles = []
-                total_articles = len(data["articles"])
-                logging.info(f"Processing {total_articles} articles for ticker {ticker}")
-                
-                for article in data["articles"]:
-                    published_at = datetime.fromisoformat(article["publishedAt"].replace("Z", "+00:00"))
-                    source = article["source"]
-                    logging.info(f"Checking source: {source.get('name', 'Unknown')} ({source.get('url', 'No URL')})")
-                    
-                    if start_date <= published_at <= end_date:
-                        if is_whitelisted_source(source):
-                            articles.append(article)
-                            logging.info(f"Added article from {source.get('name', 'Unknown')}")
-                        else:
-                            logging.info(f"Skipped article from non-whitelisted source: {source.get('name', 'Unknown')}")
-                    else:
-                        logging.info(f"Skipped article due to date range: {published_at}")
-                
-                # Sort by published date
-                articles.sort(key=lambda x: x["publishedAt"], reverse=True)
-                
-                logging.info(f"Found {len(articles)} articles from whitelisted sources")
-                return articles
-                
-    except asyncio.TimeoutError:
-        raise Exception("Timeout while fetching news articles")
-    except Exception as e:
-        raise Exception(f"Failed to fetch news articles: {str(e)}")
+                logging.info(f"Processing {len(results)} articles from {provider.name} for ticker {ticker}")
+                verdicts = await cpu_executor.run_batch(screen_articles, results, ticker, start_date, end_date)
+                irrelevant = 0
+                for article, verdict in zip(results, verdicts):
+                    key = dedupe_key(article.get("url") or "")
+                    if key in merged or verdict == "bad":
+                        continue
+                    # Drop articles that are not about the company before they cost an LLM call
+                    if verdict == "irrelevant":
+                        irrelevant += 1
+                        continue
+                    merged[key] = article
+                if irrelevant:
+                    logging.info(f"Dropped {irrelevant} articles from {provider.name} not about {ticker}")
+            
+            if first_n and len(merged) >= first_n:
+                logging.info(f"Collected {len(merged)} articles, not waiting for {len(pending)} slower providers")
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    degraded = bool(refused) or bool(errors)
+    if degraded and cached:
+        for article in cached[1]:
+            merged.setdefault(dedupe_key(article["url"]), article)
+        logging.info(f"Merged {len(cached[1])} cached articles for {ticker} after provider failures")
+    elif refused and not admitted:
+        raise Exception("Failed to fetch news articles: NewsAPI quota exhausted and no cached results")
+    elif errors and len(errors) == len(admitted):
+        raise Exception(f"Failed to fetch news articles: {'; '.join(errors)}")
+    
+    # Sort by published date
+    articles = sorted(merged.values(), key=lambda x: x["publishedAt"], reverse=True)
+    if not degraded:
+        await _store_result(cache_key, articles)
+    
+    logging.info(f"Found {len(articles)} articles from whitelisted sources")
+    return articles
@@ -0,0 +1,138 @@
+"""The convert → analyze → store steps shared by every path that analyzes a ticker."""
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from ..models import NewsArticle, ArticleAnalysis
+from .analysis_service import analyze_article_pairs
+from .compact_store import StoredEntry, article_key, article_store
+from .rollup_service import rollup_store
+from .analysis_archive import analysis_archive
+from .executor_service import cpu_executor
+from .shared_state import shared_state
+
+# How long one worker may hold a ticker's analysis lock before others proceed anyway
+ANALYSIS_LOCK_TTL = float(os.getenv("ANALYSIS_LOCK_TTL", "120"))
+
+def convert_articles(raw_articles: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Validate raw provider articles as NewsArticle fields; runs on the CPU executor for large batches.
+    
+    Returns:
+        One dict of NewsArticle fields per raw article, or None where the article is unusable.
+    """
+    articles = []
+    for idx, article in enumerate(raw_articles):
+        try:
+            # Debug logging
+            print(f"Processing article {idx}...")
+            print(f"Article data: {article}")
+            
+            # Extract data with fallbacks
+            title = article.get("title")
+            if not title:
+                print(f"Warning: No title found for article {idx}")
+                articles.append(None)
+                continue
+                
+            description = article.get("description", "No description available")
+            source_name = article.get("source", {}).get("name", "Unknown Source")
+            url = article.get("url", "")
+            published_at_str = article.get("publishedAt")
+            
+            if not published_at_str:
+                print(f"Warning: No publishedAt found for article {idx}")
+                published_at = datetime.now()
+            else:
+                try:
+                    published_at = datetime.strptime(published_at_str, "%Y-%m-%dT%H:%M:%SZ")
+                except ValueError as e:
+                    print(f"Warning: Invalid date format for article {idx}: {e}")
+                    published_at = datetime.now()
+            
+            articles.append(
+                NewsArticle(
+                    title=title,
+                    description=description,
+                    source=source_name,
+                    url=url,
+                    published_at=published_at
+                ).model_dump()
+            )
+            print(f"Successfully processed article {idx}")
+        except Exception as e:
+            print(f"Error processing article {idx}: {str(e)}")
+            print(f"Article data that caused error: {article}")
+            articles.append(None)
+            continue
+    
+    return articles
+
+async def to_news_articles(raw_articles: List[Dict[str, Any]]) -> List[NewsArticle]:
+    """Convert raw provider articles to NewsArticle objects, skipping unusable ones."""
+    converted = await cpu_executor.run_batch(convert_articles, raw_articles)
+    # Fields were validated by convert_articles, possibly in a worker process
+    return [NewsArticle.model_construct(**fields) for fields in converted if fields is not None]
+
+def _shared_key(article: NewsArticle) -> str:
+    return f"analysis:{article_key(article)}"
+
+async def _reuse_analyses(ticker: str, articles: List[NewsArticle]) -> Tuple[Dict[str, ArticleAnalysis], List[NewsArticle]]:
+    """Split articles into those already analyzed (by this or, in multi-worker mode, another worker) and the rest."""
+    reused = {}
+    pending = []
+    for article in articles:
+        key = article_key(article)
+        entry = article_store.get(ticker, key)
+        if entry is not None:
+            reused[key] = entry[1].to_model()
+        else:
+            pending.append(article)
+    
+    if pending and shared_state.shared:
+        # The prompt does not depend on the ticker, so analyses are shared per article
+        found = await shared_state.get_json(_shared_key(article) for article in pending)
+        shared_pairs = [
+            (article, ArticleAnalysis.model_construct(**found[_shared_key(article)]))
+            for article in pending if _shared_key(article) in found
+        ]
+        # Keep them locally; the worker that analyzed them already updated the rollups
+        article_store.add(ticker, shared_pairs)
+        reused.update((article_key(article), analysis) for article, analysis in shared_pairs)
+        pending = [article for article in pending if article_key(article) not in reused]
+    return reused, pending
+
+async def analyze_with_store(ticker: str, articles: List[NewsArticle]) -> Tuple[List[ArticleAnalysis], List[StoredEntry]]:
+    """
+    Analyze articles for a ticker, reusing stored analyses for articles seen before.
+    
+    New analyses are added to the article store, shared state and the analysis
+    archive, and folded into the daily rollups. Only one worker at a time analyzes a given ticker; the
+    others wait and reuse its analyses.
+    
+    Returns:
+        Tuple of the analyses for the given articles (in article order) and the
+        newly stored entries.
+    """
+    stored, pending = await _reuse_analyses(ticker, articles)
+    logging.info(f"Reusing {len(stored)} stored analyses, analyzing {len(pending)} new articles")
+    
+    new_pairs = []
+    added = []
+    if pending:
+        async with shared_state.lock(f"analyze:{ticker.upper()}", ttl=ANALYSIS_LOCK_TTL, wait=ANALYSIS_LOCK_TTL) as waited:
+            if waited:
+                reused, pending = await _reuse_analyses(ticker, pending)
+                stored.update(reused)
+                logging.info(f"Reused {len(reused)} analyses finished while waiting, analyzing {len(pending)}")
+            
+            new_pairs = await analyze_article_pairs(pending)
+            added = article_store.add(ticker, new_pairs)
+            if shared_state.shared:
+                await shared_state.set_json({_shared_key(article): analysis.model_dump() for article, analysis in new_pairs})
+        # The rollups know every article ever counted, so the archive gets each article once
+        counted = await rollup_store.add(ticker, added)
+        await analysis_archive.add(ticker, counted)
+    analyzed = {article_key(article): analysis for article, analysis in new_pairs}
+    analyzed.update(stored)
+    return [analyzed[article_key(article)] for article in articles if article_key(article) in analyzed], added
@@ -0,0 +1,383 @@
+"""Opt-in, async-aware profiling of individual requests.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_ADMIN_TOKEN>`` or
+is picked by ``PROFILE_SAMPLE_RATE``. While at least one profile is active a
+sampler thread wakes every ``PROFILE_INTERVAL_MS``:
+
+* if the profiled request's task (or a task it spawned) is running on the
+  loop, the loop thread's stack is recorded as a CPU sample;
+* otherwise the task's suspended coroutine chain is recorded as a wait
+  sample, ending in what it is awaiting.
+
+Samples are attributed to the pipeline stage marked with ``stage()``, giving
+CPU vs wait time per stage, and can be exported as a speedscope profile or
+as folded stacks for flamegraph.pl. The stage stack lives in a context
+variable, so tasks spawned by the request inherit the stage they were
+started in and their own stages never leak into each other. With profiling
+off, ``stage()`` is a single context-variable lookup and no thread runs.
+
+Requests captured for replay (see capture_service) carry a plain
+``StageTimer`` instead: stage wall times and annotations, no sampling.
+"""
+import asyncio
+import contextvars
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "20"))
+PROFILE_MAX_DEPTH = 64
+
+_active: contextvars.ContextVar[Optional["StageTimer"]] = contextvars.ContextVar("request_profile", default=None)
+_stages: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar("request_stages", default=())
+_NULL_STAGE = nullcontext()
+
+Frame = Tuple[str, str, int]
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (getattr(code, "co_qualname", code.co_name), code.co_filename, frame.f_lineno)
+
+
+def _awaiting_chain(coro) -> List[Frame]:
+    """Frames of a suspended coroutine chain, outermost first, ending in the awaited object."""
+    frames: List[Frame] = []
+    while coro is not None and len(frames) < PROFILE_MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            if not hasattr(coro, "cr_frame") and not hasattr(coro, "gi_frame"):
+                frames.append((f"<await {type(coro).__name__}>", "", 0))
+            break
+        frames.append(_frame_key(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def _running_chain(frame, root) -> List[Frame]:
+    """Frames from the task's root coroutine down to the executing frame."""
+    frames: List[Frame] = []
+    while frame is not None and len(frames) < PROFILE_MAX_DEPTH:
+        frames.append(_frame_key(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "started", "task", "token")
+
+    def __init__(self, profile: "StageTimer", name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        stack = _stages.get() + (self.name,)
+        self.token = _stages.set(stack)
+        self.task = _current_task()
+        self.profile._track(self.task, stack)
+        return self
+
+    def __exit__(self, *exc):
+        _stages.reset(self.token)
+        self.profile._track(self.task, _stages.get())
+        elapsed = time.perf_counter() - self.started
+        self.profile.stage_wall[self.name] = self.profile.stage_wall.get(self.name, 0.0) + elapsed
+        return False
+
+
+class StageTimer:
+    """Wall time per ``stage()`` of one request, plus any ``annotate()``d fields."""
+
+    def __init__(self):
+        self.stage_wall: Dict[str, float] = {}
+        self.annotations: Dict[str, Any] = {}
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def _track(self, task: Optional[asyncio.Task], stack: Tuple[str, ...]) -> None:
+        """Called with a task's stage stack whenever it changes; only sampled profiles need it."""
+
+
+class RequestProfile(StageTimer):
+    """Samples and stage timings for one profiled request."""
+
+    def __init__(self, profile_id: str, name: str, interval: float):
+        super().__init__()
+        self.id = profile_id
+        self.name = name
+        self.interval = interval
+        self.created_at = datetime.utcnow().isoformat()
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_id: Optional[int] = None
+        self.samples: Counter = Counter()
+        self.stage_cpu: Counter = Counter()
+        self.stage_wait: Counter = Counter()
+        self._task_stages: Dict[asyncio.Task, Tuple[str, ...]] = {}
+
+    def _track(self, task: Optional[asyncio.Task], stack: Tuple[str, ...]) -> None:
+        if task is None:
+            return
+        if stack:
+            self._task_stages[task] = stack
+        else:
+            self._task_stages.pop(task, None)
+
+    def stage_of(self, task: Optional[asyncio.Task]) -> str:
+        """The innermost stage the task is in; safe to call from the sampler thread."""
+        if task is None:
+            return "request"
+        get_context = getattr(task, "get_context", None)
+        if get_context is not None:
+            stack = get_context().get(_stages, ())
+        else:
+            # Before Python 3.12 another thread cannot read a task's context; use its last recorded stack
+            stack = self._task_stages.get(task, ())
+        return stack[-1] if stack else "request"
+
+    @property
+    def wall_ms(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def _owns(self, task: Optional[asyncio.Task]) -> bool:
+        if task is None:
+            return False
+        if task is self.task:
+            return True
+        get_context = getattr(task, "get_context", None)
+        return get_context is not None and get_context().get(_active) is self
+
+    def sample(self, frames: Dict[int, Any], weight: float) -> None:
+        """Record one sample covering ``weight`` seconds; called from the sampler thread."""
+        try:
+            current = asyncio.current_task(self.loop)
+        except RuntimeError:
+            current = None
+        if self._owns(current):
+            stage = self.stage_of(current)
+            frame = frames.get(self.thread_id)
+            coro = current.get_coro()
+            root = getattr(coro, "cr_frame", None)
+            stack = tuple(["[cpu]"] + [_format(f) for f in _running_chain(frame, root)])
+            self.stage_cpu[stage] += weight
+        else:
+            stage = self.stage_of(self.task)
+            chain = _awaiting_chain(self.task.get_coro()) if self.task is not None else []
+            stack = tuple(["[wait]"] + [_format(f) for f in chain])
+            self.stage_wait[stage] += weight
+        self.samples[(f"stage:{stage}",) + stack] += weight
+
+    def summary(self) -> Dict[str, Any]:
+        stages = sorted(set(self.stage_wall) | set(self.stage_cpu) | set(self.stage_wait))
+        return {
+            "id": self.id,
+            "name": self.name,
+            "created_at": self.created_at,
+            "wall_ms": round(self.wall_ms, 2),
+            "interval_ms": self.interval * 1000,
+            "sampled_ms": round(sum(self.samples.values()) * 1000, 2),
+            "stages": {
+                stage: {
+                    "wall_ms": round(self.stage_wall.get(stage, 0.0) * 1000, 2),
+                    "cpu_ms": round(self.stage_cpu[stage] * 1000, 2),
+                    "wait_ms": round(self.stage_wait[stage] * 1000, 2),
+                }
+                for stage in stages
+            },
+        }
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        frame_index: Dict[str, int] = {}
+        frames: List[Dict[str, Any]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, elapsed in self.samples.items():
+            indices = []
+            for name in stack:
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    label, _, location = name.partition(" (")
+                    entry = {"name": label}
+                    if location:
+                        file, _, line = location.rstrip(")").rpartition(":")
+                        entry["file"] = file
+                        entry["line"] = int(line) if line.isdigit() else 0
+                    frames.append(entry)
+                indices.append(frame_index[name])
+            samples.append(indices)
+            weights.append(round(elapsed * 1000, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "rust-carfagno-enterprises",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def to_folded(self) -> str:
+        """Folded stacks ("frame;frame;frame weight") for flamegraph.pl, weighted in microseconds."""
+        return "\n".join(
+            f"{';'.join(name.replace(';', ',') for name in stack)} {round(elapsed * 1_000_000)}"
+            for stack, elapsed in self.samples.items()
+        ) + "\n"
+
+
+def _format(frame: Frame) -> str:
+    name, filename, line = frame
+    if not filename:
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class Profiler:
+    """Starts request profiles, runs the shared sampler thread and keeps finished profiles."""
+
+    def __init__(
+        self,
+        admin_token: str = PROFILE_ADMIN_TOKEN,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+        max_stored: int = PROFILE_MAX_STORED,
+    ):
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.max_stored = max_stored
+        self._ids = itertools.count(1)
+        self._running: List[RequestProfile] = []
+        self._stored: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.admin_token) or self.sample_rate > 0
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        """True if the token matches PROFILE_ADMIN_TOKEN; always False while no token is configured."""
+        if not self.admin_token or token is None:
+            return False
+        return hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def should_profile(self, header_value: Optional[str]) -> bool:
+        if self.is_admin(header_value):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, name: str) -> Tuple[RequestProfile, contextvars.Token]:
+        """Start profiling the current task; must be called from inside it."""
+        profile = RequestProfile(f"{int(time.time())}-{next(self._ids)}", name, self.interval)
+        profile.task = asyncio.current_task()
+        profile.loop = asyncio.get_running_loop()
+        profile.thread_id = threading.get_ident()
+        token = _active.set(profile)
+        with self._lock:
+            self._running.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile, token
+
+    def finish(self, profile: RequestProfile, token: contextvars.Token) -> None:
+        _active.reset(token)
+        profile.finished = time.perf_counter()
+        with self._lock:
+            self._running.remove(profile)
+            self._stored[profile.id] = profile
+            while len(self._stored) > self.max_stored:
+                self._stored.popitem(last=False)
+
+    def _sample_loop(self) -> None:
+        # The sampler competes with the loop thread for the GIL, so samples are
+        # weighted by the time actually elapsed since the previous one
+        last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            weight, last = now - last, now
+            with self._lock:
+                running = list(self._running)
+                if not running:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for profile in running:
+                try:
+                    profile.sample(frames, weight)
+                except Exception:
+                    # Frames can disappear under us; a lost sample is fine
+                    pass
+            del frames
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return self._stored.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [p.summary() for p in reversed(self._stored.values())]
+
+
+def stage(name: str):
+    """Mark a pipeline stage of the current request; a no-op unless it is being profiled or timed."""
+    timer = _active.get()
+    if timer is None:
+        return _NULL_STAGE
+    return timer.stage(name)
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields (counts, cache outcomes) to the current request's timer, if any."""
+    timer = _active.get()
+    if timer is not None:
+        timer.annotations.update(fields)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _active.get()
+
+
+def start_timer() -> Tuple[StageTimer, contextvars.Token]:
+    """Time the stages of the current request without sampling it."""
+    timer = StageTimer()
+    return timer, _active.set(timer)
+
+
+def stop_timer(token: contextvars.Token) -> None:
+    _active.reset(token)
+
+
+profiler = Profiler()
@@ -0,0 +1,127 @@
+"""NewsAPI request budget accounting.
+
+NewsAPI plans have a hard daily request quota. Spend is recorded in a local
+SQLite file so every worker process on the host draws from the same budget.
+Part of the budget is reserved for interactive requests: background work
+(refreshes, load-test scripts) is refused once only the reserve is left.
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+NEWSAPI_DAILY_QUOTA = int(os.getenv("NEWSAPI_DAILY_QUOTA", "100"))
+NEWSAPI_INTERACTIVE_RESERVE = int(os.getenv("NEWSAPI_INTERACTIVE_RESERVE", "20"))
+NEWSAPI_QUOTA_DB = os.getenv(
+    "NEWSAPI_QUOTA_DB", os.path.join(tempfile.gettempdir(), "rust_newsapi_quota.sqlite3")
+)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)
+
+
+class QuotaExceededError(Exception):
+    """Raised when the upstream reports that the quota is used up."""
+
+
+class QuotaManager:
+    """Tracks upstream request spend per UTC day in a shared SQLite file."""
+
+    def __init__(
+        self,
+        path: str = NEWSAPI_QUOTA_DB,
+        daily_limit: int = NEWSAPI_DAILY_QUOTA,
+        interactive_reserve: int = NEWSAPI_INTERACTIVE_RESERVE,
+    ):
+        self.path = path
+        self.daily_limit = daily_limit
+        self.interactive_reserve = min(interactive_reserve, daily_limit)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_spend (day TEXT PRIMARY KEY, used INTEGER NOT NULL)"
+            )
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _limit_for(self, priority: str) -> int:
+        if priority == PRIORITY_INTERACTIVE:
+            return self.daily_limit
+        return self.daily_limit - self.interactive_reserve
+
+    def try_acquire(self, priority: str = PRIORITY_INTERACTIVE) -> bool:
+        """Atomically spend one request if the priority's share of the budget allows it."""
+        day = self._today()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT used FROM quota_spend WHERE day = ?", (day,)).fetchone()
+            used = row[0] if row else 0
+            if used >= self._limit_for(priority):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO quota_spend (day, used) VALUES (?, 1) "
+                "ON CONFLICT(day) DO UPDATE SET used = used + 1",
+                (day,),
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def mark_exhausted(self) -> None:
+        """Record that the upstream refused us, so no worker spends more today."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO quota_spend (day, used) VALUES (?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET used = MAX(used, excluded.used)",
+                (self._today(), self.daily_limit),
+            )
+        finally:
+            conn.close()
+
+    def used(self) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT used FROM quota_spend WHERE day = ?", (self._today(),)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def remaining(self) -> int:
+        return max(0, self.daily_limit - self.used())
+
+    def is_low(self) -> bool:
+        """True once only the interactive reserve is left."""
+        return self.remaining() <= self.interactive_reserve
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE) -> bool:
+        return await asyncio.to_thread(self.try_acquire, priority)
+
+    def status(self) -> Dict[str, Any]:
+        used = self.used()
+        remaining = max(0, self.daily_limit - used)
+        return {
+            "day": self._today(),
+            "daily_limit": self.daily_limit,
+            "used": used,
+            "remaining": remaining,
+            "interactive_reserve": self.interactive_reserve,
+            "background_allowed": used < self._limit_for(PRIORITY_BACKGROUND),
+            "low": remaining <= self.interactive_reserve,
+        }
+
+
+quota_manager = QuotaManager()
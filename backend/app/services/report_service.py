@@ -1,16 +1,9 @@
 from datetime import datetime
-from typing import List
+from typing import List, Tuple
 from ..models import NewsArticle, ArticleAnalysis, StockAnalysisResponse
 
-async def generate_report(
-    ticker: str,
-    articles: List[NewsArticle],
-    analyses: List[ArticleAnalysis]
-) -> StockAnalysisResponse:
-    """Generate a comprehensive analysis report."""
-    
-    # Calculate overall sentiment score
-    sentiment_scores = [analysis.sentiment_score for analysis in analyses]
+def summarize_sentiment(ticker: str, sentiment_scores: List[float]) -> Tuple[float, str, List[str]]:
+    """Aggregate per-article scores into (overall score, overall sentiment, trading implications)."""
     overall_score = sum(sentiment_scores) / len(sentiment_scores) if sentiment_scores else 0
     
     # Determine overall sentiment
@@ -34,6 +27,20 @@ async def generate_report(
     if abs(overall_score) > 0.7:
         trading_implications.append(f"Strong sentiment intensity suggests potential significant price movement for {ticker}")
     
+    return overall_score, overall_sentiment, trading_implications
+
+async def generate_report(
+    ticker: str,
+    articles: List[NewsArticle],
+    analyses: List[ArticleAnalysis]
+) -> StockAnalysisResponse:
+    """Generate a comprehensive analysis report."""
+    
+    # A single pass over floats; cheaper inline than shipping to the CPU executor at any
+    # article count (see benchmarks/bench_cpu_offload.py)
+    sentiment_scores = [analysis.sentiment_score for analysis in analyses]
+    overall_score, overall_sentiment, trading_implications = summarize_sentiment(ticker, sentiment_scores)
+    
     return StockAnalysisResponse(
         ticker=ticker,
         overall_sentiment=overall_sentiment,
@@ -0,0 +1,252 @@
+"""Materialized per-ticker, per-day sentiment rollups.
+
+Rollups are updated incrementally as new analyses land, so charting sentiment
+over weeks never re-runs the LLM. Each ticker's rollups are held as parallel
+typed arrays (one per column) sorted by day, which keeps them compact and
+makes a date-range query two binary searches and a slice. They are persisted
+per ticker as a small columnar file: a JSON header line followed by each
+column's raw array bytes, a JSON line of per-day source breakdowns and a JSON
+line of the articles counted each day. The article keys make folding in an
+analysis idempotent, so articles re-analyzed after a restart or an eviction
+from the in-memory store are not counted twice.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .compact_store import StoredEntry, article_key
+from ..models import TICKER_PATTERN
+from .shared_state import shared_state
+
+ROLLUP_DIR = os.getenv("ROLLUP_DIR", os.path.join(tempfile.gettempdir(), "rust_rollups"))
+
+EPOCH = date(1970, 1, 1)
+SECONDS_PER_DAY = 86400
+
+# Wire services count more towards the weighted mean than aggregators
+SOURCE_WEIGHTS = {
+    "reuters": 1.5,
+    "bloomberg": 1.5,
+    "wall street journal": 1.5,
+    "wsj": 1.5,
+}
+DEFAULT_SOURCE_WEIGHT = 1.0
+
+COLUMNS = (
+    ("day", "i"),
+    ("count", "I"),
+    ("sum", "d"),
+    ("weight_sum", "d"),
+    ("weighted_sum", "d"),
+    ("min", "d"),
+    ("max", "d"),
+)
+
+
+def source_weight(source: str) -> float:
+    name = source.lower()
+    for prefix, weight in SOURCE_WEIGHTS.items():
+        if name.startswith(prefix) or name.startswith("the " + prefix):
+            return weight
+    return DEFAULT_SOURCE_WEIGHT
+
+
+def to_day(value: date) -> int:
+    return (value - EPOCH).days
+
+
+def from_day(day: int) -> date:
+    return EPOCH + timedelta(days=day)
+
+
+class TickerRollups:
+    """Columnar daily rollups for one ticker."""
+
+    def __init__(self):
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS}
+        self.sources: List[Dict[str, int]] = []
+        self.keys: List[Set[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.columns["day"])
+
+    def add(self, day: int, score: float, source: str, key: Optional[str] = None) -> bool:
+        """Count one analysis; returns False if the article identified by key was already counted."""
+        cols = self.columns
+        days = cols["day"]
+        idx = bisect_left(days, day)
+        weight = source_weight(source)
+        if idx < len(days) and days[idx] == day:
+            if key is not None:
+                if key in self.keys[idx]:
+                    return False
+                self.keys[idx].add(key)
+            cols["count"][idx] += 1
+            cols["sum"][idx] += score
+            cols["weight_sum"][idx] += weight
+            cols["weighted_sum"][idx] += weight * score
+            cols["min"][idx] = min(cols["min"][idx], score)
+            cols["max"][idx] = max(cols["max"][idx], score)
+            breakdown = self.sources[idx]
+            breakdown[source] = breakdown.get(source, 0) + 1
+            return True
+        for name, value in (
+            ("day", day), ("count", 1), ("sum", score), ("weight_sum", weight),
+            ("weighted_sum", weight * score), ("min", score), ("max", score),
+        ):
+            cols[name].insert(idx, value)
+        self.sources.insert(idx, {source: 1})
+        self.keys.insert(idx, {key} if key is not None else set())
+        return True
+
+    def query(self, start_day: int, end_day: int) -> List[Dict[str, Any]]:
+        cols = self.columns
+        lo = bisect_left(cols["day"], start_day)
+        hi = bisect_right(cols["day"], end_day)
+        points = []
+        for i in range(lo, hi):
+            count = cols["count"][i]
+            points.append({
+                "date": from_day(cols["day"][i]).isoformat(),
+                "count": count,
+                "sum": cols["sum"][i],
+                "mean": cols["sum"][i] / count,
+                "weighted_mean": cols["weighted_sum"][i] / cols["weight_sum"][i],
+                "min": cols["min"][i],
+                "max": cols["max"][i],
+                "sources": dict(self.sources[i]),
+            })
+        return points
+
+    def to_bytes(self) -> bytes:
+        header = {"version": 2, "rows": len(self), "columns": [list(c) for c in COLUMNS]}
+        parts = [json.dumps(header).encode() + b"\n"]
+        parts.extend(self.columns[name].tobytes() for name, _ in COLUMNS)
+        parts.append(b"\n" + json.dumps(self.sources).encode())
+        parts.append(b"\n" + json.dumps([sorted(keys) for keys in self.keys]).encode())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TickerRollups":
+        rollups = cls()
+        newline = data.index(b"\n")
+        header = json.loads(data[:newline])
+        rows = header["rows"]
+        offset = newline + 1
+        for name, typecode in header["columns"]:
+            column = array(typecode)
+            size = rows * column.itemsize
+            column.frombytes(data[offset:offset + size])
+            rollups.columns[name] = column
+            offset += size
+        trailer = data[offset + 1:].split(b"\n")
+        rollups.sources = json.loads(trailer[0])
+        # Version 1 files did not record which articles were counted
+        rollups.keys = [set(keys) for keys in json.loads(trailer[1])] if len(trailer) > 1 else [set() for _ in range(rows)]
+        return rollups
+
+
+def fold(rollups: TickerRollups, entries: List[StoredEntry]) -> List[StoredEntry]:
+    """Add entries not already counted to the rollups; returns those that were added."""
+    added = []
+    for article, analysis in entries:
+        day = article.published_ts // SECONDS_PER_DAY
+        if rollups.add(day, analysis.sentiment_score, article.source, article_key(article)):
+            added.append((article, analysis))
+    return added
+
+
+class RollupStore:
+    """
+    Per-ticker daily rollups, loaded lazily from and persisted to ROLLUP_DIR.
+    
+    In multi-worker mode the files are the source of truth: writers take a
+    shared lock and re-read before folding in new entries, and readers reload
+    a ticker whose file another worker has rewritten.
+    """
+
+    def __init__(self, directory: str = ROLLUP_DIR):
+        self.directory = directory
+        self._tickers: Dict[str, TickerRollups] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._save_locks: Dict[str, asyncio.Lock] = {}
+
+    def _path(self, ticker: str) -> str:
+        # Callers validate tickers, but never let one name a file outside the directory
+        if not TICKER_PATTERN.fullmatch(ticker):
+            raise ValueError(f"Invalid ticker: {ticker!r}")
+        return os.path.join(self.directory, f"{ticker}.cols")
+
+    def _read(self, ticker: str) -> TickerRollups:
+        try:
+            with open(self._path(ticker), "rb") as f:
+                return TickerRollups.from_bytes(f.read())
+        except FileNotFoundError:
+            return TickerRollups()
+
+    def _write(self, ticker: str, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _mtime(self, ticker: str) -> int:
+        try:
+            return os.stat(self._path(ticker)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    async def _reload_if_changed(self, ticker: str) -> None:
+        mtime = await asyncio.to_thread(self._mtime, ticker)
+        if mtime != self._mtimes.get(ticker):
+            self._tickers[ticker] = await asyncio.to_thread(self._read, ticker)
+            self._mtimes[ticker] = mtime
+
+    async def _get(self, ticker: str) -> TickerRollups:
+        if shared_state.shared:
+            await self._reload_if_changed(ticker)
+        rollups = self._tickers.get(ticker)
+        if rollups is None:
+            loaded = await asyncio.to_thread(self._read, ticker)
+            # Another coroutine may have loaded it while we were reading
+            rollups = self._tickers.setdefault(ticker, loaded)
+        return rollups
+
+    async def add(self, ticker: str, entries: Iterable[StoredEntry]) -> List[StoredEntry]:
+        """Fold newly analyzed articles into the ticker's rollups and persist them; returns those not counted before."""
+        ticker = ticker.upper()
+        entries = list(entries)
+        if not entries:
+            return []
+        if shared_state.shared:
+            # Read-modify-write under a lock every worker honours, so no update is lost
+            async with shared_state.lock(f"rollup:{ticker}", ttl=10, wait=10):
+                rollups = await self._get(ticker)
+                added = fold(rollups, entries)
+                if added:
+                    await asyncio.to_thread(self._write, ticker, rollups.to_bytes())
+                    self._mtimes[ticker] = await asyncio.to_thread(self._mtime, ticker)
+            return added
+        rollups = await self._get(ticker)
+        added = fold(rollups, entries)
+        if added:
+            async with self._save_locks.setdefault(ticker, asyncio.Lock()):
+                await asyncio.to_thread(self._write, ticker, rollups.to_bytes())
+        return added
+
+    async def query(self, ticker: str, start: Optional[date], end: Optional[date]) -> List[Dict[str, Any]]:
+        """Return daily points between start and end (inclusive) from the rollups only."""
+        rollups = await self._get(ticker.upper())
+        start_day = to_day(start) if start else 0
+        end_day = to_day(end) if end else 2 ** 31 - 1
+        return rollups.query(start_day, end_day)
+
+
+rollup_store = RollupStore()
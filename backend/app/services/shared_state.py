@@ -0,0 +1,464 @@
+"""State shared by every worker process serving the API.
+
+Running several uvicorn/gunicorn workers splits module-level state N ways.
+This layer carries what must be coordinated across them:
+
+* cache entries (news results per ticker, analyses per article URL),
+* rate-limit counters (per-client windows for ``/api/analyze``),
+* single-flight locks, so concurrent requests for the same ticker, in any
+  worker, trigger one upstream fetch/analysis instead of N.
+
+Backends are picked with ``SHARED_STATE_BACKEND``:
+
+* ``memory`` (default): process-local, for a single worker; no I/O
+* ``sqlite``: a file on the host, shared by all local workers (the default
+  under gunicorn.conf.py)
+* ``redis``: any server speaking the Redis protocol (``SHARED_STATE_URL``),
+  shared across hosts; benchmarks/resp_server.py is a local stand-in
+
+Backend calls are blocking and run in a worker thread. A failing backend never
+fails a request: reads miss, writes are dropped, counters allow and locks are
+skipped, with a warning.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+SHARED_STATE_PATH = os.getenv(
+    "SHARED_STATE_PATH", os.path.join(tempfile.gettempdir(), "rust_shared_state.sqlite3")
+)
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "redis://127.0.0.1:6379/0")
+# How long shared cache entries live (news results are also the degraded-mode fallback)
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", "86400"))
+LOCK_POLL_INTERVAL = 0.05
+
+
+class StateBackend:
+    """Blocking key/value operations every backend provides."""
+
+    # False when the state is only visible to this process
+    shared = True
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Add one to a counter, creating it with the given TTL; returns the new value."""
+        raise NotImplementedError
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    def unlock(self, key: str, owner: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Process-local dict with expiry."""
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> bool:
+        if key in self._data and self._expires[key] <= now:
+            del self._data[key]
+            del self._expires[key]
+        return key in self._data
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        now = time.time()
+        with self._lock:
+            return {key: self._data[key] for key in keys if self._live(key, now)}
+
+    def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        expires = time.time() + ttl
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = value
+                self._expires[key] = expires
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.time()
+        with self._lock:
+            if not self._live(key, now):
+                self._data[key] = b"0"
+                self._expires[key] = now + ttl
+            value = int(self._data[key]) + 1
+            self._data[key] = str(value).encode()
+            return value
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._live(key, now):
+                return False
+            self._data[key] = owner.encode()
+            self._expires[key] = now + ttl
+            return True
+
+    def unlock(self, key: str, owner: str) -> None:
+        with self._lock:
+            if self._data.get(key) == owner.encode():
+                del self._data[key]
+                del self._expires[key]
+
+
+class SQLiteBackend(StateBackend):
+    """A SQLite file shared by every worker on the host."""
+
+    # Expired rows are purged on every Nth write
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        self._initialized = False
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            self._initialized = True
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM shared_state WHERE expires <= ?", (now,))
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        conn = self._connect()
+        try:
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, value FROM shared_state WHERE key IN ({placeholders}) AND expires > ?",
+                (*keys, time.time()),
+            ).fetchall()
+            return {key: bytes(value) for key, value in rows}
+        finally:
+            conn.close()
+
+    def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        if not items:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO shared_state (key, value, expires) VALUES (?, ?, ?)",
+                [(key, value, now + ttl) for key, value in items.items()],
+            )
+            self._maybe_purge(conn, now)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT value FROM shared_state WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                value = 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_state (key, value, expires) VALUES (?, ?, ?)",
+                    (key, b"1", now + ttl),
+                )
+            else:
+                value = int(row[0]) + 1
+                conn.execute("UPDATE shared_state SET value = ? WHERE key = ?", (str(value).encode(), key))
+            self._maybe_purge(conn, now)
+            conn.execute("COMMIT")
+            return value
+        finally:
+            conn.close()
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT 1 FROM shared_state WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_state (key, value, expires) VALUES (?, ?, ?)",
+                    (key, owner.encode(), now + ttl),
+                )
+            conn.execute("COMMIT")
+            return row is None
+        finally:
+            conn.close()
+
+    def unlock(self, key: str, owner: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM shared_state WHERE key = ? AND value = ?", (key, owner.encode()))
+        finally:
+            conn.close()
+
+
+class RESPError(Exception):
+    """An error reply from a Redis-protocol server."""
+
+
+class RedisBackend(StateBackend):
+    """Minimal Redis protocol (RESP2) client; one connection per calling thread."""
+
+    def __init__(self, url: str = SHARED_STATE_URL, timeout: float = 2.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._send([["AUTH", self.password]])
+            if self.db:
+                self._send([["SELECT", str(self.db)]])
+        return conn
+
+    @staticmethod
+    def _encode(command: List[Any]) -> bytes:
+        out = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RESPError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise RESPError(f"Unexpected reply: {line!r}")
+
+    def _closed_by_server(self, sock: socket.socket) -> bool:
+        """True if the server has closed this idle connection (it reads as EOF without blocking)."""
+        sock.setblocking(False)
+        try:
+            return sock.recv(1, socket.MSG_PEEK) == b""
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            sock.settimeout(self.timeout)
+
+    def _send(self, commands: List[List[Any]]) -> List[Any]:
+        """
+        Pipeline commands and return their replies.
+
+        A pooled connection the server has closed is replaced before anything
+        is sent. Once the commands are on the wire they are never re-sent, since
+        INCR is not idempotent; a connection lost mid-call raises instead.
+        """
+        sock, reader = self._connection()
+        if self._closed_by_server(sock):
+            self.close()
+            sock, reader = self._connection()
+        try:
+            sock.sendall(b"".join(self._encode(command) for command in commands))
+            return [self._read_reply(reader) for _ in commands]
+        except (ConnectionError, OSError):
+            self.close()
+            raise
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        values = self._send([["MGET", *keys]])[0]
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        if items:
+            ttl_ms = max(1, int(ttl * 1000))
+            self._send([["SET", key, value, "PX", ttl_ms] for key, value in items.items()])
+
+    def incr(self, key: str, ttl: float) -> int:
+        # Create the counter with its TTL first and in the same round trip, so it can never outlive it
+        _, value = self._send([["SET", key, 0, "PX", max(1, int(ttl * 1000)), "NX"], ["INCR", key]])
+        return value
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        return self._send([["SET", key, owner, "NX", "PX", max(1, int(ttl * 1000))]])[0] == "OK"
+
+    def unlock(self, key: str, owner: str) -> None:
+        # Not atomic: if the lock expired and was re-taken between these calls the new
+        # holder loses it early, which at worst lets one duplicate fetch through
+        if self._send([["GET", key]])[0] == owner.encode():
+            self._send([["DEL", key]])
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            try:
+                conn[0].close()
+            except OSError:
+                pass
+
+
+def build_backend(name: str = SHARED_STATE_BACKEND) -> StateBackend:
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "redis":
+        return RedisBackend()
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {name}")
+
+
+class SharedState:
+    """Async facade over a backend, degrading to process-local behaviour on errors."""
+
+    def __init__(self, backend: Optional[StateBackend] = None):
+        self._backend = backend
+        self._local_locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "lock_waits": 0, "lock_timeouts": 0, "errors": 0}
+
+    @property
+    def backend(self) -> StateBackend:
+        if self._backend is None:
+            self._backend = build_backend()
+        return self._backend
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    async def _call(self, method: str, *args: Any, default: Any = None) -> Any:
+        try:
+            return await asyncio.to_thread(getattr(self.backend, method), *args)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logging.warning(f"Shared state {method} failed, continuing without it: {e}")
+            return default
+
+    async def get_json(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fetch and decode cache entries; missing or expired keys are left out."""
+        keys = list(keys)
+        found = await self._call("get_many", keys, default={})
+        self._stats["hits"] += len(found)
+        self._stats["misses"] += len(keys) - len(found)
+        return {key: json.loads(value) for key, value in found.items()}
+
+    async def set_json(self, items: Dict[str, Any], ttl: float = SHARED_CACHE_TTL) -> None:
+        if not items:
+            return
+        encoded = {key: json.dumps(value, default=str).encode() for key, value in items.items()}
+        self._stats["writes"] += len(encoded)
+        await self._call("set_many", encoded, ttl)
+
+    async def incr(self, key: str, ttl: float) -> int:
+        return await self._call("incr", key, ttl, default=0)
+
+    async def count(self, key: str) -> int:
+        found = await self._call("get_many", [key], default={})
+        return int(found[key]) if key in found else 0
+
+    @asynccontextmanager
+    async def lock(self, key: str, ttl: float = 30.0, wait: float = 30.0) -> AsyncIterator[bool]:
+        """
+        Hold ``key`` across every worker for up to ``ttl`` seconds.
+
+        Used as a single-flight guard: yields True when another holder had to be
+        waited for, so the caller can check whether that holder already produced
+        what it needs. After ``wait`` seconds, or if the backend is down, the
+        caller proceeds without the lock.
+        """
+        # Locks live in their own namespace so they never collide with cache entries
+        key = f"lock:{key}"
+        # Coalesce waiters in this process first so only one of them polls the backend
+        local = self._local_locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            waited = local.locked()
+            async with local:
+                owner = uuid.uuid4().hex
+                deadline = time.monotonic() + wait
+                held = await self._call("try_lock", key, owner, ttl)
+                while held is False and time.monotonic() < deadline:
+                    waited = True
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+                    held = await self._call("try_lock", key, owner, ttl)
+                if waited:
+                    self._stats["lock_waits"] += 1
+                if held is False:
+                    self._stats["lock_timeouts"] += 1
+                try:
+                    yield waited
+                finally:
+                    if held:
+                        await self._call("unlock", key, owner)
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._local_locks[key]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": type(self.backend).__name__, "shared": self.shared, **self._stats}
+
+    def close(self) -> None:
+        if self._backend is not None:
+            self._backend.close()
+
+
+shared_state = SharedState()
@@ -0,0 +1,285 @@
+"""Ticker subscriptions with shared fan-out of analysis updates.
+
+Clients subscribe to tickers over a WebSocket. Each subscribed ticker has a
+single producer task that periodically refreshes it through the normal
+pipeline; its result is fanned out to every subscriber, so N dashboards
+watching a ticker cost one computation instead of N. Updates produced by
+``/api/analyze`` are fanned out the same way. The last update of each
+watched ticker is kept so late subscribers get it immediately.
+
+Every subscriber has a bounded queue. When a slow consumer's queue is full the
+oldest message is dropped; a consumer that keeps falling behind is
+disconnected as soon as it crosses the limit, even while a send to it is
+blocked. Refreshes take a background-priority admission slot like any other
+pipeline run, and the number of connections and producers is capped.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from .admission_service import admission_controller, AdmissionRejected
+from .compact_store import StoredEntry
+from .news_service import get_news_articles
+from .pipeline_service import analyze_with_store, to_news_articles
+from .quota_service import PRIORITY_BACKGROUND
+from .report_service import generate_report
+from ..models import StockAnalysisResponse, normalize_ticker
+
+WS_REFRESH_INTERVAL = float(os.getenv("WS_REFRESH_INTERVAL", "300"))
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "100"))
+WS_MAX_DROPPED = int(os.getenv("WS_MAX_DROPPED", "500"))
+WS_MAX_TICKERS_PER_CONNECTION = int(os.getenv("WS_MAX_TICKERS_PER_CONNECTION", "25"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "500"))
+WS_MAX_PRODUCERS = int(os.getenv("WS_MAX_PRODUCERS", "100"))
+
+Message = Dict[str, Any]
+
+
+def build_update(ticker: str, entries: List[StoredEntry], report: Optional[StockAnalysisResponse]) -> Message:
+    """Message carrying newly analyzed articles and the ticker's current aggregate sentiment."""
+    message = {
+        "type": "update",
+        "ticker": ticker.upper(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "analyses": [
+            {
+                "article": article.to_model().model_dump(mode="json"),
+                "analysis": analysis.to_model().model_dump(mode="json"),
+            }
+            for article, analysis in entries
+        ],
+    }
+    if report is not None:
+        message["overall_sentiment"] = report.overall_sentiment
+        message["overall_sentiment_score"] = report.overall_sentiment_score
+        message["article_count"] = len(report.articles)
+    return message
+
+
+async def refresh_ticker(ticker: str) -> Optional[Message]:
+    """Run the pipeline for a subscribed ticker at background priority, in an admission slot."""
+    started = await admission_controller.acquire(None, PRIORITY_BACKGROUND)
+    try:
+        raw_articles = await get_news_articles(ticker, priority=PRIORITY_BACKGROUND)
+        articles = await to_news_articles(raw_articles)
+        if not articles:
+            return None
+        analyses, added = await analyze_with_store(ticker, articles)
+        report = await generate_report(ticker, articles, analyses)
+        return build_update(ticker, added, report)
+    finally:
+        admission_controller.release(started)
+
+
+class SlowConsumerError(Exception):
+    """Raised to a subscriber that has dropped too many messages."""
+
+
+class ConnectionLimitError(Exception):
+    """Raised when WS_MAX_CONNECTIONS subscribers are already connected."""
+
+
+class Subscriber:
+    """One WebSocket connection's bounded outbound queue and ticker set."""
+
+    def __init__(self, queue_size: int = WS_QUEUE_SIZE, max_dropped: int = WS_MAX_DROPPED):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.tickers: Set[str] = set()
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self._too_slow = asyncio.Event()
+
+    @property
+    def too_slow(self) -> bool:
+        return self.dropped > self.max_dropped
+
+    def offer(self, message: Message) -> bool:
+        """Enqueue without blocking, dropping the oldest message if the queue is full."""
+        dropped = False
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                dropped = True
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+        if self.too_slow:
+            # Signal the connection now; its sender may be stuck on a client that stopped reading
+            self._too_slow.set()
+        return not dropped
+
+    async def next_message(self) -> Message:
+        return await self.queue.get()
+
+    async def wait_too_slow(self) -> None:
+        """Return only by raising SlowConsumerError, once the subscriber has dropped too many messages."""
+        await self._too_slow.wait()
+        raise SlowConsumerError(f"Dropped {self.dropped} messages")
+
+
+RefreshFn = Callable[[str], Awaitable[Optional[Message]]]
+
+
+class TickerHub:
+    """Tracks subscribers per ticker and runs one producer task per subscribed ticker."""
+
+    def __init__(
+        self,
+        refresh: Optional[RefreshFn] = None,
+        interval: float = WS_REFRESH_INTERVAL,
+        max_connections: int = WS_MAX_CONNECTIONS,
+        max_producers: int = WS_MAX_PRODUCERS,
+    ):
+        self.refresh = refresh
+        self.interval = interval
+        self.max_connections = max_connections
+        self.max_producers = max_producers
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._producers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, Message] = {}
+        self._connections: Set[Subscriber] = set()
+        self._stats = {
+            "connections_total": 0,
+            "messages_published": 0,
+            "messages_delivered": 0,
+            "messages_dropped": 0,
+            "slow_consumer_disconnects": 0,
+            "refreshes": 0,
+            "refreshes_deferred": 0,
+            "refresh_errors": 0,
+            "connections_refused": 0,
+            "subscriptions_refused": 0,
+        }
+
+    def connect(self) -> Subscriber:
+        if len(self._connections) >= self.max_connections:
+            self._stats["connections_refused"] += 1
+            raise ConnectionLimitError(f"Too many connections ({self.max_connections})")
+        subscriber = Subscriber()
+        self._connections.add(subscriber)
+        self._stats["connections_total"] += 1
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber, slow: bool = False) -> None:
+        self.unsubscribe(subscriber, list(subscriber.tickers))
+        self._connections.discard(subscriber)
+        self._stats["messages_dropped"] += subscriber.dropped
+        if slow:
+            self._stats["slow_consumer_disconnects"] += 1
+
+    def subscribe(self, subscriber: Subscriber, tickers: List[str]) -> List[str]:
+        """
+        Subscribe to valid tickers, returning those actually added.
+        
+        Subject to the per-connection cap; a ticker nobody watches yet is also
+        refused once WS_MAX_PRODUCERS tickers have producers.
+        """
+        added = []
+        for ticker in tickers:
+            try:
+                ticker = normalize_ticker(ticker)
+            except ValueError:
+                continue
+            if ticker in subscriber.tickers:
+                continue
+            if len(subscriber.tickers) >= WS_MAX_TICKERS_PER_CONNECTION:
+                break
+            if self.refresh is not None and ticker not in self._producers and len(self._producers) >= self.max_producers:
+                self._stats["subscriptions_refused"] += 1
+                continue
+            subscriber.tickers.add(ticker)
+            self._subscribers.setdefault(ticker, set()).add(subscriber)
+            added.append(ticker)
+            if ticker in self._latest:
+                # Late joiners get the last update immediately rather than waiting a cycle
+                subscriber.offer(dict(self._latest[ticker], type="snapshot"))
+            self._ensure_producer(ticker)
+        return added
+
+    def unsubscribe(self, subscriber: Subscriber, tickers: List[str]) -> None:
+        for ticker in tickers:
+            ticker = ticker.strip().upper()
+            subscriber.tickers.discard(ticker)
+            subscribers = self._subscribers.get(ticker)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[ticker]
+                self._latest.pop(ticker, None)
+                producer = self._producers.pop(ticker, None)
+                if producer is not None:
+                    producer.cancel()
+
+    def publish(self, ticker: str, message: Message) -> int:
+        """Fan a message out to every subscriber of the ticker; returns the number reached."""
+        ticker = ticker.upper()
+        self._stats["messages_published"] += 1
+        subscribers = self._subscribers.get(ticker, ())
+        if subscribers:
+            # Only watched tickers keep a snapshot, so this is bounded by the subscribed tickers
+            self._latest[ticker] = message
+        for subscriber in subscribers:
+            subscriber.offer(message)
+        self._stats["messages_delivered"] += len(subscribers)
+        return len(subscribers)
+
+    def _ensure_producer(self, ticker: str) -> None:
+        if self.refresh is None:
+            return
+        producer = self._producers.get(ticker)
+        if producer is None or producer.done():
+            self._producers[ticker] = asyncio.create_task(self._produce(ticker), name=f"ticker-producer-{ticker}")
+
+    async def _produce(self, ticker: str) -> None:
+        while True:
+            try:
+                message = await self.refresh(ticker)
+                self._stats["refreshes"] += 1
+                if message is not None and self._is_news(ticker, message):
+                    self.publish(ticker, message)
+            except asyncio.CancelledError:
+                raise
+            except AdmissionRejected as e:
+                # The server is busy with other pipelines; try again next cycle
+                self._stats["refreshes_deferred"] += 1
+                logging.info(f"Refresh deferred for subscribed ticker {ticker}: {e}")
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                logging.warning(f"Refresh failed for subscribed ticker {ticker}: {e}")
+                self.publish(ticker, {"type": "error", "ticker": ticker, "detail": str(e)})
+            await asyncio.sleep(self.interval)
+
+    def _is_news(self, ticker: str, message: Message) -> bool:
+        """Only publish refreshes that add analyses or move the aggregate."""
+        latest = self._latest.get(ticker)
+        if latest is None or latest.get("type") == "error" or message.get("analyses"):
+            return True
+        return message.get("overall_sentiment_score") != latest.get("overall_sentiment_score")
+
+    async def close(self) -> None:
+        producers = list(self._producers.values())
+        self._producers.clear()
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        queued = [s.queue.qsize() for s in self._connections]
+        return {
+            "connections": len(self._connections),
+            "subscribed_tickers": len(self._subscribers),
+            "subscribers_by_ticker": {t: len(s) for t, s in sorted(self._subscribers.items())},
+            "producers": len(self._producers),
+            "max_connections": self.max_connections,
+            "max_producers": self.max_producers,
+            "max_queue_depth": max(queued, default=0),
+            "messages_dropped_open": sum(s.dropped for s in self._connections),
+            **self._stats,
+        }
+
+
+ticker_hub = TickerHub(refresh=refresh_ticker)
@@ -0,0 +1,175 @@
+"""Ticker symbol index, upstream query expansion and local relevance scoring.
+
+Searching NewsAPI for a bare ticker such as "V" or "HD" mostly returns
+unrelated articles, each of which would then cost an LLM call. The bundled
+``data/symbols.tsv`` maps tickers to company names and aliases. It is
+memory-mapped once and binary-searched on lookup. The entries are used to
+build precise upstream queries and to drop articles that are not about the
+company before they are sent to the LLM.
+"""
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+SYMBOLS_PATH = os.getenv(
+    "SYMBOLS_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "symbols.tsv")
+)
+RELEVANCE_MIN_SCORE = float(os.getenv("RELEVANCE_MIN_SCORE", "1.0"))
+
+# NewsAPI rejects q values longer than 500 characters
+MAX_QUERY_LENGTH = 500
+
+TITLE_NAME_SCORE = 3.0
+BODY_NAME_SCORE = 1.5
+CASHTAG_SCORE = 2.0
+BARE_TICKER_SCORE = 1.0
+
+CORPORATE_SUFFIXES = re.compile(
+    r",?\s+(?:&\s+)?(inc\.?|incorporated|corporation|corp\.?|company|co\.?|plc|ltd\.?|group|holdings)$",
+    re.IGNORECASE,
+)
+
+
+class Symbol(NamedTuple):
+    ticker: str
+    name: str
+    aliases: Tuple[str, ...]
+    ambiguous: bool
+
+    @property
+    def names(self) -> List[str]:
+        """Company name (with and without its corporate suffix) and aliases, longest first."""
+        short = CORPORATE_SUFFIXES.sub("", self.name).strip()
+        if short.lower().startswith("the "):
+            short = short[4:]
+        names = {self.name, short, *self.aliases}
+        return sorted((n for n in names if n), key=len, reverse=True)
+
+
+class SymbolIndex:
+    """Read-only, memory-mapped ticker index over a sorted TSV file."""
+
+    def __init__(self, path: str = SYMBOLS_PATH):
+        self.path = path
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._offsets = array("Q")
+        self._keys: List[bytes] = []
+
+    def _open(self) -> mmap.mmap:
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            position = 0
+            size = len(self._map)
+            while position < size:
+                end = self._map.find(b"\n", position)
+                if end == -1:
+                    end = size
+                if self._map[position:position + 1] not in (b"#", b"\n", b""):
+                    tab = self._map.find(b"\t", position, end)
+                    self._offsets.append(position)
+                    self._keys.append(self._map[position:tab])
+                position = end + 1
+        return self._map
+
+    def lookup(self, ticker: str) -> Optional[Symbol]:
+        data = self._open()
+        key = ticker.strip().upper().encode()
+        idx = bisect_left(self._keys, key)
+        if idx == len(self._keys) or self._keys[idx] != key:
+            return None
+        start = self._offsets[idx]
+        end = data.find(b"\n", start)
+        fields = data[start:end if end != -1 else len(data)].decode().split("\t")
+        fields += [""] * (4 - len(fields))
+        aliases = tuple(a.strip() for a in fields[2].split("|") if a.strip())
+        return Symbol(fields[0], fields[1], aliases, "a" in fields[3])
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._keys)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._offsets = array("Q")
+            self._keys = []
+
+
+symbol_index = SymbolIndex()
+
+
+@lru_cache(maxsize=1024)
+def lookup_symbol(ticker: str) -> Optional[Symbol]:
+    try:
+        return symbol_index.lookup(ticker)
+    except OSError:
+        return None
+
+
+def build_query(ticker: str) -> str:
+    """Build a NewsAPI ``q`` expression from the ticker's company names and aliases."""
+    symbol = lookup_symbol(ticker)
+    if symbol is None:
+        return ticker
+    terms = [f'"{name}"' for name in symbol.names]
+    if not symbol.ambiguous:
+        terms.append(symbol.ticker)
+    query = ""
+    for term in terms:
+        candidate = f"{query} OR {term}" if query else term
+        if len(candidate) > MAX_QUERY_LENGTH:
+            break
+        query = candidate
+    return query
+
+
+@lru_cache(maxsize=1024)
+def _patterns(ticker: str) -> Optional[Tuple[Pattern, Pattern, Optional[Pattern]]]:
+    symbol = lookup_symbol(ticker)
+    if symbol is None:
+        return None
+    # Company names are proper nouns: match them as written (or in all caps, as in
+    # shouted headlines), so "student visa rules" or "apple pie" do not count for V or AAPL
+    variants = sorted({v for n in symbol.names for v in (n, n.upper())}, key=len, reverse=True)
+    names = "|".join(re.escape(v) for v in variants)
+    name_pattern = re.compile(rf"(?<!\w)(?:{names})(?!\w)")
+    tag = re.escape(symbol.ticker)
+    cashtag_pattern = re.compile(rf"\${tag}\b|\(\s*(?:(?:NYSE|NASDAQ|Nasdaq|NYSE American)\s*:\s*)?{tag}\s*\)|(?:NYSE|NASDAQ|Nasdaq)\s*:\s*{tag}\b")
+    bare_pattern = None if symbol.ambiguous else re.compile(rf"(?<![\w$]){tag}(?!\w)")
+    return name_pattern, cashtag_pattern, bare_pattern
+
+
+def relevance_score(ticker: str, article: Dict[str, Any]) -> Optional[float]:
+    """Score how clearly an article is about the ticker's company; None if the ticker is not indexed."""
+    patterns = _patterns(ticker.strip().upper())
+    if patterns is None:
+        return None
+    name_pattern, cashtag_pattern, bare_pattern = patterns
+    title = article.get("title") or ""
+    body = article.get("description") or ""
+    text = f"{title}\n{body}"
+
+    score = 0.0
+    if name_pattern.search(title):
+        score += TITLE_NAME_SCORE
+    elif name_pattern.search(body):
+        score += BODY_NAME_SCORE
+    if cashtag_pattern.search(text):
+        score += CASHTAG_SCORE
+    if bare_pattern is not None and bare_pattern.search(text):
+        score += BARE_TICKER_SCORE
+    return score
+
+
+def is_relevant(ticker: str, article: Dict[str, Any], min_score: float = RELEVANCE_MIN_SCORE) -> bool:
+    """Keep articles scoring at least ``min_score``; tickers missing from the index are not filtered."""
+    score = relevance_score(ticker, article)
+    return score is None or score >= min_score
@@ -0,0 +1,251 @@
+"""Validation and repair of ChatGPT analysis responses.
+
+Responses are first validated directly against ``ArticleAnalysis``. When that
+fails, the JSON is decoded tolerantly and each field is coerced on its own:
+numeric strings become floats (percentages are scaled, so "85%" is 0.85) and
+scores are clamped to [-1, 1], sentiment
+labels are normalized, single strings become one-item lists, and a missing
+``significant_quotes`` becomes an empty list. Only the fields that still
+cannot be repaired are re-asked, so a single bad field no longer throws away
+the whole analysis.
+"""
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from ..models import ArticleAnalysis
+
+SENTIMENT_LABELS = ("positive", "neutral", "negative")
+LABEL_ALIASES = {
+    "bullish": "positive",
+    "pos": "positive",
+    "positive sentiment": "positive",
+    "slightly positive": "positive",
+    "very positive": "positive",
+    "bearish": "negative",
+    "neg": "negative",
+    "negative sentiment": "negative",
+    "slightly negative": "negative",
+    "very negative": "negative",
+    "mixed": "neutral",
+    "neutral sentiment": "neutral",
+    "none": "neutral",
+}
+# Score bands used to infer a label the model left out or garbled
+POSITIVE_THRESHOLD = 0.15
+NEGATIVE_THRESHOLD = -0.15
+
+FIELD_SCHEMAS = {
+    "summary": '"summary": "Brief summary of the article"',
+    "sentiment": '"sentiment": "positive" | "neutral" | "negative"',
+    "sentiment_score": '"sentiment_score": number between -1.0 and 1.0',
+    "key_takeaways": '"key_takeaways": ["point 1", "point 2", "point 3"]',
+    "significant_quotes": '"significant_quotes": ["quote 1", "quote 2"]',
+}
+
+_MISSING = object()
+
+
+class ValidationStats:
+    """Counts how LLM responses were turned into analyses."""
+
+    def __init__(self):
+        self.outcomes: Counter = Counter()
+        self.invalid_fields: Counter = Counter()
+
+    def record(self, outcome: str) -> None:
+        self.outcomes[outcome] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        total = sum(self.outcomes.values())
+        return {
+            "responses": total,
+            "valid": self.outcomes["valid"],
+            "repaired": self.outcomes["repaired"],
+            "reasked": self.outcomes["reasked"],
+            "failed": self.outcomes["failed"],
+            "repair_rate": round((self.outcomes["repaired"] + self.outcomes["reasked"]) / total, 4) if total else 0.0,
+            "failure_rate": round(self.outcomes["failed"] / total, 4) if total else 0.0,
+            "invalid_fields": dict(self.invalid_fields),
+        }
+
+
+validation_stats = ValidationStats()
+
+
+def loads_tolerant(text: str) -> Any:
+    """Decode JSON, tolerating code fences and prose around a single object."""
+    text = text.strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+
+
+def normalize_label(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    label = value.strip().lower()
+    if label in SENTIMENT_LABELS:
+        return label
+    return LABEL_ALIASES.get(label)
+
+
+def label_for_score(score: float) -> str:
+    if score >= POSITIVE_THRESHOLD:
+        return "positive"
+    if score <= NEGATIVE_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+def coerce_score(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        percent = value.endswith("%")
+        try:
+            value = float(value.rstrip("%").strip())
+        except ValueError:
+            return None
+        if percent:
+            value /= 100
+    if not isinstance(value, (int, float)) or value != value:
+        return None
+    return max(-1.0, min(1.0, float(value)))
+
+
+def coerce_text(value: Any) -> Optional[str]:
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        value = " ".join(value)
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def coerce_list(value: Any) -> Optional[List[str]]:
+    if isinstance(value, str):
+        value = [line.strip(" -•*\t") for line in value.splitlines()]
+    if isinstance(value, list):
+        items = [str(v).strip() for v in value if v is not None and str(v).strip()]
+        return items
+    return None
+
+
+def repair_fields(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Coerce each field independently; returns the repaired values and the fields still invalid."""
+    repaired: Dict[str, Any] = {}
+    invalid: List[str] = []
+
+    summary = coerce_text(data.get("summary"))
+    if summary is None:
+        invalid.append("summary")
+    else:
+        repaired["summary"] = summary
+
+    score = coerce_score(data.get("sentiment_score", _MISSING))
+    label = normalize_label(data.get("sentiment"))
+    if score is None:
+        invalid.append("sentiment_score")
+    else:
+        repaired["sentiment_score"] = score
+    if label is None and score is not None:
+        label = label_for_score(score)
+    if label is None:
+        invalid.append("sentiment")
+    else:
+        repaired["sentiment"] = label
+
+    takeaways = coerce_list(data.get("key_takeaways"))
+    if not takeaways:
+        invalid.append("key_takeaways")
+    else:
+        repaired["key_takeaways"] = takeaways
+
+    # Articles without direct quotes are common; an absent list is not worth a re-ask
+    quotes = coerce_list(data.get("significant_quotes", []))
+    repaired["significant_quotes"] = quotes if quotes is not None else []
+
+    return repaired, invalid
+
+
+def _is_sound(analysis: ArticleAnalysis) -> bool:
+    return analysis.sentiment in SENTIMENT_LABELS and -1.0 <= analysis.sentiment_score <= 1.0
+
+
+Checked = Tuple[Optional[Dict[str, Any]], Dict[str, Any], List[str], str]
+
+
+def check_analysis(text: str) -> Checked:
+    """
+    Validate an LLM response, repairing what can be repaired locally.
+    
+    Pure and picklable so batches can run on the CPU executor; nothing is
+    recorded here (see ``record_check``).
+    
+    Returns:
+        Tuple of (analysis fields or None, repaired field values, fields that still
+        need re-asking, outcome). The outcome is "valid", "repaired" or "invalid".
+    """
+    try:
+        analysis = ArticleAnalysis.model_validate_json(text)
+        if _is_sound(analysis):
+            fields = analysis.model_dump()
+            return fields, fields, [], "valid"
+    except ValidationError:
+        pass
+
+    data = loads_tolerant(text)
+    if not isinstance(data, dict):
+        data = {}
+    repaired, invalid = repair_fields(data)
+    if invalid:
+        return None, repaired, invalid, "invalid"
+    return ArticleAnalysis(**repaired).model_dump(), repaired, [], "repaired"
+
+
+def check_analyses(texts: List[str]) -> List[Checked]:
+    """Batch form of ``check_analysis`` for ``cpu_executor.run_batch``."""
+    return [check_analysis(text) for text in texts]
+
+
+def record_check(checked: Checked) -> Optional[ArticleAnalysis]:
+    """Count a check in ``validation_stats`` and build the analysis if it passed."""
+    fields, _, invalid, outcome = checked
+    validation_stats.invalid_fields.update(invalid)
+    if outcome == "invalid":
+        return None
+    validation_stats.record(outcome)
+    # Already validated by check_analysis, possibly in a worker process
+    return ArticleAnalysis.model_construct(**fields)
+
+
+def reask_prompt(fields: List[str]) -> str:
+    schema = ",\n    ".join(FIELD_SCHEMAS[field] for field in fields)
+    return (
+        "Some fields in your previous answer were missing or invalid: "
+        f"{', '.join(fields)}. Return a JSON object containing only these fields:\n"
+        f"{{\n    {schema}\n}}"
+    )
+
+
+def merge_reask(repaired: Dict[str, Any], fields: List[str], text: str) -> Optional[ArticleAnalysis]:
+    """Fill the re-asked fields from a follow-up response; None if any is still invalid."""
+    data = loads_tolerant(text)
+    if not isinstance(data, dict):
+        return None
+    fixed, still_invalid = repair_fields({**repaired, **{k: v for k, v in data.items() if k in fields}})
+    if still_invalid:
+        return None
+    return ArticleAnalysis(**fixed)
@@ -0,0 +1,107 @@
+"""Compare bytes per article for pydantic models vs. the compact store records.
+
+Each representation is built from freshly decoded upstream-style dicts, which
+are then released, so the figure is everything the representation keeps alive.
+
+Run from the backend directory:
+    python benchmarks/bench_article_memory.py [count]
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.models import NewsArticle, ArticleAnalysis
+from app.services.compact_store import ArticleStore
+
+SOURCES = ["Bloomberg", "Reuters", "CNBC", "MarketWatch", "Yahoo Finance", "The Wall Street Journal"]
+SENTIMENTS = ["positive", "neutral", "negative"]
+
+
+def make_raw(count):
+    """Build JSON-decoded records so every string is a distinct object, as in production."""
+    base = datetime(2024, 1, 1)
+    records = []
+    for i in range(count):
+        records.append(json.dumps({
+            "title": f"Company {i % 500} reports quarterly results number {i}",
+            "description": f"Shares moved after the announcement from company {i % 500}. " * 3,
+            "url": f"https://example.com/news/{i}",
+            "published_at": (base + timedelta(minutes=i)).isoformat(),
+            "source": SOURCES[i % len(SOURCES)],
+            "summary": f"Summary of article {i} covering earnings and guidance.",
+            "sentiment": SENTIMENTS[i % len(SENTIMENTS)],
+            "sentiment_score": ((i % 21) - 10) / 10,
+            "key_takeaways": [f"Takeaway {i}-{k}" for k in range(3)],
+            "significant_quotes": [f"Quote {i}-{k}" for k in range(2)],
+        }))
+    return records
+
+
+def build_models(records):
+    pairs = []
+    for line in records:
+        data = json.loads(line)
+        article = NewsArticle(
+            title=data["title"],
+            description=data["description"],
+            url=data["url"],
+            published_at=data["published_at"],
+            source=data["source"],
+        )
+        analysis = ArticleAnalysis(
+            summary=data["summary"],
+            sentiment=data["sentiment"],
+            sentiment_score=data["sentiment_score"],
+            key_takeaways=data["key_takeaways"],
+            significant_quotes=data["significant_quotes"],
+        )
+        pairs.append((article, analysis))
+    return pairs
+
+
+def build_store(records):
+    store = ArticleStore(max_per_ticker=len(records))
+    # Convert in small batches so the intermediate models do not all stay alive
+    for start in range(0, len(records), 100):
+        store.add("BENCH", build_models(records[start:start + 100]))
+    return store
+
+
+def retained_bytes(build, records):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build(records)
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    records = make_raw(count)
+    print(f"Measuring retained memory for {count} articles with analyses")
+    print("-" * 50)
+
+    pairs, model_bytes = retained_bytes(build_models, records)
+    del pairs
+    store, store_bytes = retained_bytes(build_store, records)
+
+    print(f"Pydantic models: {model_bytes / count:.0f} bytes/article")
+    print(f"Compact store:   {store_bytes / count:.0f} bytes/article")
+    print(f"Reduction:       {100 * (1 - store_bytes / model_bytes):.1f}%")
+    print(f"Records stored:  {len(store)}")
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Find where offloading post-processing batches to the process pool starts to pay off.
+
+For each batch kernel and batch size, compares running inline on the event loop
+with ``CPUExecutor.run_batch`` on a warm process pool. Reports wall time and the
+longest event loop stall (how long other requests' I/O would be delayed), and
+two crossovers: the batch size from which offloading stalls the loop less, and
+the one from which it also finishes sooner (needs more than one core).
+
+Run from the backend directory:
+    python benchmarks/bench_cpu_offload.py [workers]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from app.services.executor_service import CPUExecutor  # noqa: E402
+from app.services.news_service import screen_articles  # noqa: E402
+from app.services.pipeline_service import convert_articles  # noqa: E402
+from app.services.report_service import summarize_sentiment  # noqa: E402
+from app.services.validation_service import check_analyses  # noqa: E402
+
+SIZES = [10, 50, 100, 200, 500, 1000, 2000, 5000]
+SOURCES = ["Reuters", "Bloomberg", "CNBC", "MarketWatch", "Financial Times"]
+
+
+def make_raw_articles(n):
+    now = datetime.utcnow()
+    return [
+        {
+            "title": f"Apple shares move as iPhone demand shifts, story {i}",
+            "description": "Apple Inc. reported results that analysts said " + "were in line with expectations. " * 5,
+            "url": f"https://www.reuters.com/markets/apple-{i}",
+            "publishedAt": (now - timedelta(hours=i % 600)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "source": {"name": SOURCES[i % len(SOURCES)], "url": "https://www.reuters.com"},
+        }
+        for i in range(n)
+    ]
+
+
+def make_llm_texts(n):
+    texts = []
+    for i in range(n):
+        analysis = {
+            "summary": "Apple beat expectations on services revenue. " * 3,
+            "sentiment": "positive",
+            "sentiment_score": round(random.uniform(-1, 1), 2),
+            "key_takeaways": ["Services grew", "Margins held", "Guidance raised"],
+            "significant_quotes": ["We are pleased with the quarter"],
+        }
+        if i % 7 == 0:
+            # Repairable: label alias, numeric string, missing quotes
+            analysis["sentiment"] = "Bullish"
+            analysis["sentiment_score"] = "0.4"
+            del analysis["significant_quotes"]
+        texts.append(json.dumps(analysis))
+    return texts
+
+
+def summarize_batch(scores):
+    # summarize_sentiment is a whole-batch reduction; wrap it so it fits run_batch
+    return [summarize_sentiment("AAPL", scores)]
+
+
+def crossover(rows, column):
+    """Smallest batch size from which the pool wins at every larger size too."""
+    found = None
+    for row in reversed(rows):
+        if not row[column]:
+            break
+        found = row[0]
+    return found if found is not None else f"none up to {SIZES[-1]}"
+
+
+async def measure(executor, func, items, *args):
+    """Return (wall seconds, longest loop stall seconds) for one run_batch call."""
+    stall = 0.0
+    running = True
+
+    async def heartbeat():
+        nonlocal stall
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.0005)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.002)
+    start = time.perf_counter()
+    await executor.run_batch(func, items, *args)
+    wall = time.perf_counter() - start
+    await asyncio.sleep(0.002)
+    running = False
+    await beat
+    return wall, stall
+
+
+async def run(workers, out):
+    inline = CPUExecutor(mode="inline")
+    pooled = CPUExecutor(mode="process", workers=workers, min_items=0)
+    end = datetime.utcnow() + timedelta(minutes=1)
+    start = end - timedelta(days=30)
+    kernels = [
+        ("screen_articles", screen_articles, make_raw_articles, ("AAPL", start, end)),
+        ("convert_articles", convert_articles, make_raw_articles, ()),
+        ("check_analyses", check_analyses, make_llm_texts, ()),
+        ("summarize_sentiment", summarize_batch, lambda n: [random.uniform(-1, 1) for _ in range(n)], ()),
+    ]
+    # Warm the pool so worker start-up and imports are not counted
+    await pooled.run_batch(screen_articles, make_raw_articles(workers * 4), "AAPL", start, end)
+
+    for name, func, make, args in kernels:
+        out.write(f"\n{name} ({workers} workers)\n")
+        out.write(f"{'items':>6} {'inline ms':>10} {'pool ms':>9} {'inline stall ms':>16} {'pool stall ms':>14}\n")
+        rows = []
+        for n in SIZES:
+            items = make(n)
+            inline_runs = [await measure(inline, func, items, *args) for _ in range(3)]
+            pool_runs = [await measure(pooled, func, items, *args) for _ in range(3)]
+            inline_wall, inline_stall = (min(r[i] for r in inline_runs) for i in (0, 1))
+            pool_wall, pool_stall = (min(r[i] for r in pool_runs) for i in (0, 1))
+            out.write(
+                f"{n:>6} {inline_wall * 1000:>10.2f} {pool_wall * 1000:>9.2f} "
+                f"{inline_stall * 1000:>16.2f} {pool_stall * 1000:>14.2f}\n"
+            )
+            rows.append((n, pool_stall < inline_stall, pool_wall < inline_wall))
+        out.write(
+            f"loop stall crossover: {crossover(rows, 1)}, "
+            f"wall time crossover: {crossover(rows, 2)}\n"
+        )
+        out.flush()
+    pooled.shutdown()
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else min(4, os.cpu_count() or 1)
+    random.seed(0)
+    # The kernels print per-article debug output; keep it (and the workers', which
+    # inherit stdout) out of the results table
+    out = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    asyncio.run(run(workers, out))
+
+
+if __name__ == "__main__":
+    main()
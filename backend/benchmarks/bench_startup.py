@@ -0,0 +1,75 @@
+"""Track cold-start cost: import time of app.main and time to first /api/health response.
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py [runs]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env):
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=backend_dir, env=env, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_response(env, timeout=30.0):
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("Server did not become healthy in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def summarize(label, samples):
+    print(f"{label}: median {statistics.median(samples) * 1000:.0f}ms, "
+          f"min {min(samples) * 1000:.0f}ms, max {max(samples) * 1000:.0f}ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = dict(os.environ, PYTHONPATH=backend_dir)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+
+    print(f"Measuring startup over {runs} runs")
+    print("-" * 50)
+    summarize("Import app.main", [measure_import(env) for _ in range(runs)])
+    summarize("Time to first /api/health", [measure_first_response(env) for _ in range(runs)])
+    print("-" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Measure /api/analyze throughput as the number of worker processes grows.
+
+For each worker count, starts gunicorn (gunicorn.conf.py) against stub NewsAPI/OpenAI
+upstreams, warms every ticker once, then drives a skewed ticker mix from concurrent
+clients. Reports requests/s, latency percentiles and upstream calls; with shared state
+working, LLM calls stay flat as workers are added because analyses made by one worker
+are reused by the others. Upstream call counts include the warm-up.
+
+Run from the backend directory:
+    python benchmarks/bench_workers.py [worker counts, e.g. 1,2,4] [seconds] [sqlite|redis]
+"""
+import asyncio
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import aiohttp
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_upstreams import StubUpstreams  # noqa: E402
+import resp_server  # noqa: E402
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "JPM", "V", "HD"]
+# Zipf-like popularity: the first tickers get most of the traffic
+WEIGHTS = [1 / (rank + 1) for rank in range(len(TICKERS))]
+CLIENTS = 16
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_healthy(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not become healthy in time")
+
+
+async def drive(port, seconds):
+    url = f"http://127.0.0.1:{port}/api/analyze"
+    latencies = []
+    errors = 0
+    deadline = None
+
+    async def client(session):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            ticker = random.choices(TICKERS, WEIGHTS)[0]
+            start = time.perf_counter()
+            async with session.post(url, json={"ticker": ticker}) as response:
+                await response.read()
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+    async def warm(session, ticker):
+        async with session.post(url, json={"ticker": ticker}) as response:
+            await response.read()
+
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        # Warm every ticker once so the run measures steady state, not first analyses
+        await asyncio.gather(*(warm(session, ticker) for ticker in TICKERS))
+        deadline = time.monotonic() + seconds
+        await asyncio.gather(*(client(session) for _ in range(CLIENTS)))
+    return latencies, errors
+
+
+def run(workers, seconds, backend, redis_port):
+    # Every run starts from empty shared state
+    resp_server.execute([b"FLUSHALL"])
+    state_dir = tempfile.mkdtemp(prefix="bench_workers_")
+    stubs = StubUpstreams(articles_per_query=20, news_latency=0.1, llm_latency=0.05).start()
+    port = free_port()
+    env = {
+        **os.environ,
+        **stubs.env(),
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "SHARED_STATE_BACKEND": backend,
+        "SHARED_STATE_PATH": os.path.join(state_dir, "shared.sqlite3"),
+        "SHARED_STATE_URL": f"redis://127.0.0.1:{redis_port}/0",
+        "ROLLUP_DIR": os.path.join(state_dir, "rollups"),
+        "NEWSAPI_QUOTA_DB": os.path.join(state_dir, "quota.sqlite3"),
+        "NEWSAPI_DAILY_QUOTA": "1000000",
+        "ANALYZE_RATE_PER_MINUTE": "0",
+        "LOOP_MONITOR_ENABLED": "false",
+        "CPU_EXECUTOR": "inline",
+        "PYTHONPATH": backend_dir,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(port)
+        latencies, errors = asyncio.run(drive(port, seconds))
+        calls = stubs.stats()
+    finally:
+        proc.terminate()
+        proc.wait()
+        stubs.stop()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(
+        f"{workers:>7} {len(latencies) / seconds:>8.1f} {statistics.median(latencies) * 1000 if latencies else 0:>8.0f} "
+        f"{p95 * 1000:>8.0f} {errors:>6} {calls['news']:>10} {calls['llm']:>9}"
+    )
+
+
+def main():
+    worker_counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,2,4").split(",")]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 15.0
+    backend = sys.argv[3] if len(sys.argv) > 3 else "sqlite"
+    redis_port = free_port()
+    if backend == "redis":
+        resp_server.start_in_thread(redis_port)
+    random.seed(0)
+    print(f"{CLIENTS} clients, {seconds:.0f}s per run, {backend} shared state, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'news calls':>10} {'llm calls':>9}")
+    for workers in worker_counts:
+        run(workers, seconds, backend, redis_port)
+
+
+if __name__ == "__main__":
+    main()
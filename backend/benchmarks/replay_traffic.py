@@ -0,0 +1,250 @@
+"""Replay captured /api/analyze traffic against a local instance with stubbed upstreams.
+
+Reads a capture written with TRAFFIC_CAPTURE_PATH (see app/services/capture_service.py)
+and fires every request open-loop at its recorded offset divided by the speed-up, with
+the recorded client and priority, so bursts, ticker skew and repeat visitors look like
+production. The API runs under gunicorn (gunicorn.conf.py) against StubUpstreams with
+fresh state, so every run starts cold. Reports:
+
+- status codes and latency percentiles, next to the captured ones
+- firing lag: how far behind schedule requests were sent (large lag means the
+  replay machine, not the server, was the bottleneck)
+- cache hit rates: news fetches served without calling the news API (only
+  concurrent fetches for a ticker are coalesced, so expect this to track bursts),
+  and articles served without an LLM call
+- upstream calls avoided, against one news call and one LLM call per article for
+  every successful request
+
+Rate limiting is off by default since a sped-up replay would trip it for every
+client; pass --rate-limits to keep the configured limits.
+
+Without a capture, --synthesize N generates N requests over a skewed ticker mix
+with a market-open burst.
+
+Run from the backend directory:
+    python benchmarks/replay_traffic.py capture.jsonl [--speedup 10] [--workers 2]
+    python benchmarks/replay_traffic.py --synthesize 300 [--duration 600]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+
+import aiohttp
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_workers import TICKERS, WEIGHTS, free_port, wait_healthy  # noqa: E402
+from stub_upstreams import StubUpstreams  # noqa: E402
+
+PRIORITY_MIX = {"interactive": 0.8, "background": 0.2}
+
+
+def load_capture(path):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "ts" in record and "ticker" in record:
+                records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def synthesize(count, duration, seed=0):
+    """Requests from a pool of repeat clients; the first tenth of the window gets a third of them."""
+    rng = random.Random(seed)
+    clients = [f"client-{i}" for i in range(max(1, count // 5))]
+    start = time.time()
+    records = []
+    for i in range(count):
+        offset = rng.uniform(0, duration * 0.1) if i < count // 3 else rng.uniform(0, duration)
+        records.append({
+            "ts": start + offset,
+            "client": rng.choice(clients),
+            "ticker": rng.choices(TICKERS, WEIGHTS)[0],
+            "priority": rng.choices(list(PRIORITY_MIX), list(PRIORITY_MIX.values()))[0],
+        })
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def client_address(client):
+    """A stable private address per captured client, sent as X-Forwarded-For so rate limits apply per client."""
+    digest = hashlib.sha256(client.encode()).digest()
+    return f"10.{digest[0]}.{digest[1]}.{digest[2]}"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def replay(port, records, speedup):
+    url = f"http://127.0.0.1:{port}/api/analyze"
+    first = records[0]["ts"]
+    results = []
+
+    async def fire(session, record, start):
+        scheduled = start + (record["ts"] - first) / speedup
+        await asyncio.sleep(max(0.0, scheduled - time.monotonic()))
+        sent = time.monotonic()
+        headers = {"X-Forwarded-For": client_address(record.get("client", "replay"))}
+        if record.get("priority"):
+            headers["X-Request-Priority"] = record["priority"]
+        try:
+            async with session.post(url, json={"ticker": record["ticker"]}, headers=headers) as response:
+                body = await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            body, status = b"", "error"
+        articles = len(json.loads(body).get("articles", [])) if status == 200 else 0
+        results.append({
+            "status": status,
+            "latency": time.monotonic() - sent,
+            "lag": sent - scheduled,
+            "articles": articles,
+        })
+
+    timeout = aiohttp.ClientTimeout(total=300)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        start = time.monotonic() + 0.5
+        await asyncio.gather(*(fire(session, record, start) for record in records))
+    return results
+
+
+def fetch_json(port, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def run(records, args):
+    state_dir = tempfile.mkdtemp(prefix="replay_")
+    stubs = StubUpstreams(
+        articles_per_query=args.articles, news_latency=args.news_latency, llm_latency=args.llm_latency
+    ).start()
+    port = free_port()
+    env = {
+        **os.environ,
+        **stubs.env(),
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(args.workers),
+        "SHARED_STATE_BACKEND": "sqlite",
+        "SHARED_STATE_PATH": os.path.join(state_dir, "shared.sqlite3"),
+        "ROLLUP_DIR": os.path.join(state_dir, "rollups"),
+        "NEWSAPI_QUOTA_DB": os.path.join(state_dir, "quota.sqlite3"),
+        "NEWSAPI_DAILY_QUOTA": "1000000",
+        "TRAFFIC_CAPTURE_PATH": "",
+        # The replay stands in for the reverse proxy, forwarding each captured client's address
+        "TRUSTED_PROXIES": "127.0.0.1",
+        "LOOP_MONITOR_ENABLED": "false",
+        "PYTHONPATH": backend_dir,
+    }
+    if not args.rate_limits:
+        env["ANALYZE_RATE_PER_MINUTE"] = "0"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(port)
+        started = time.monotonic()
+        results = asyncio.run(replay(port, records, args.speedup))
+        elapsed = time.monotonic() - started
+        calls = stubs.stats()
+        metrics = fetch_json(port, "/api/metrics")
+    finally:
+        proc.terminate()
+        proc.wait()
+        stubs.stop()
+        shutil.rmtree(state_dir, ignore_errors=True)
+    report(records, results, calls, metrics, elapsed, args)
+
+
+def report(records, results, calls, metrics, elapsed, args):
+    span = records[-1]["ts"] - records[0]["ts"]
+    ok = [result for result in results if result["status"] == 200]
+    statuses = Counter(str(result["status"]) for result in results)
+    print(
+        f"{len(records)} requests over {span:.0f}s captured, replayed at {args.speedup:g}x in {elapsed:.1f}s "
+        f"({args.workers} workers, {os.cpu_count()} CPUs)"
+    )
+    print("status:  " + ", ".join(f"{status} x{count}" for status, count in sorted(statuses.items())))
+
+    print(f"\n{'latency ms':<12} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    rows = [("replay", [result["latency"] * 1000 for result in ok])]
+    captured = [record["duration_ms"] for record in records if record.get("status") == 200 and "duration_ms" in record]
+    if captured:
+        rows.append(("captured", captured))
+    rows.append(("firing lag", [max(0.0, result["lag"]) * 1000 for result in results]))
+    for name, values in rows:
+        print(
+            f"{name:<12} {percentile(values, 0.5):>8.0f} {percentile(values, 0.9):>8.0f} "
+            f"{percentile(values, 0.99):>8.0f} {max(values, default=0):>8.0f}"
+        )
+
+    # Each successful request needs one news fetch and one LLM call per article it returns
+    # when nothing is cached; failed requests may have made calls too, so rates are floors
+    articles = sum(result["articles"] for result in ok)
+    news_needed, llm_needed = len(ok), articles
+    print(f"\n{'upstream':<12} {'no cache':>9} {'calls':>9} {'avoided':>9} {'hit rate':>9}")
+    for name, needed, made in (("news", news_needed, calls["news"]), ("llm", llm_needed, calls["llm"])):
+        avoided = max(0, needed - made)
+        rate = avoided / needed if needed else 0.0
+        print(f"{name:<12} {needed:>9} {made:>9} {avoided:>9} {rate:>9.1%}")
+    total_needed = news_needed + llm_needed
+    total_avoided = max(0, total_needed - calls["news"] - calls["llm"])
+    print(f"{'total':<12} {total_needed:>9} {calls['news'] + calls['llm']:>9} {total_avoided:>9} "
+          f"{(total_avoided / total_needed if total_needed else 0.0):>9.1%}")
+
+    shared = metrics.get("shared_state", {})
+    if shared:
+        print("\nshared state: " + ", ".join(f"{key}={value}" for key, value in shared.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("capture", nargs="?", help="JSONL capture written with TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--synthesize", type=int, metavar="N", help="replay N synthetic requests instead of a capture")
+    parser.add_argument("--duration", type=float, default=600.0, help="window of synthetic traffic in seconds")
+    parser.add_argument("--speedup", type=float, default=10.0, help="replay this many times faster than captured")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--articles", type=int, help="articles per stub news query (default: as captured, else 20)")
+    parser.add_argument("--news-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--rate-limits", action="store_true", help="keep ANALYZE_RATE_PER_MINUTE as configured")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        records = synthesize(args.synthesize, args.duration)
+    elif args.capture:
+        records = load_capture(args.capture)
+    else:
+        parser.error("pass a capture file or --synthesize N")
+    records = records[:args.limit] if args.limit else records
+    if not records:
+        sys.exit("No requests to replay")
+    if args.articles is None:
+        args.articles = max((record.get("articles", 0) for record in records), default=0) or 20
+    run(records, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Local stand-in for Redis, speaking enough of the protocol for SHARED_STATE_BACKEND=redis.
+
+Supports PING, AUTH, SELECT, GET, MGET, SET (EX/PX/NX), DEL, INCR, PEXPIRE and
+FLUSHALL with key expiry. Single database, no persistence.
+
+Run from the backend directory:
+    python benchmarks/resp_server.py [port]
+and point the API at it with SHARED_STATE_BACKEND=redis SHARED_STATE_URL=redis://127.0.0.1:<port>/0
+"""
+import asyncio
+import sys
+import threading
+import time
+
+data = {}
+expires = {}
+
+
+def live(key):
+    if key in expires and expires[key] <= time.time():
+        data.pop(key, None)
+        expires.pop(key, None)
+    return key in data
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode(v) for v in value)
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def execute(args):
+    command = args[0].upper()
+    keys = args[1:]
+    if command in (b"PING", b"AUTH", b"SELECT", b"FLUSHALL"):
+        if command == b"FLUSHALL":
+            data.clear()
+            expires.clear()
+        return "PONG" if command == b"PING" else "OK"
+    if command == b"GET":
+        return data[keys[0]] if live(keys[0]) else None
+    if command == b"MGET":
+        return [data[key] if live(key) else None for key in keys]
+    if command == b"SET":
+        key, value, options = args[1], args[2], [a.upper() for a in args[3:]]
+        if b"NX" in options and live(key):
+            return None
+        data[key] = value
+        expires.pop(key, None)
+        for unit, scale in ((b"PX", 1000), (b"EX", 1)):
+            if unit in options:
+                expires[key] = time.time() + int(options[options.index(unit) + 1]) / scale
+        return "OK"
+    if command == b"DEL":
+        removed = sum(1 for key in keys if live(key))
+        for key in keys:
+            data.pop(key, None)
+            expires.pop(key, None)
+        return removed
+    if command == b"INCR":
+        value = int(data[keys[0]]) + 1 if live(keys[0]) else 1
+        data[keys[0]] = str(value).encode()
+        return value
+    if command == b"PEXPIRE":
+        if not live(keys[0]):
+            return 0
+        expires[keys[0]] = time.time() + int(keys[1]) / 1000
+        return 1
+    return ValueError(f"unknown command '{command.decode()}'")
+
+
+async def handle(reader, writer):
+    try:
+        while True:
+            header = await reader.readline()
+            if not header:
+                break
+            args = []
+            for _ in range(int(header[1:-2])):
+                length = int((await reader.readline())[1:-2])
+                args.append((await reader.readexactly(length + 2))[:-2])
+            writer.write(encode(execute(args)))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(port, ready=None):
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def start_in_thread(port):
+    """Run the server on a daemon thread; returns once it accepts connections."""
+    ready = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(serve(port, ready)), daemon=True).start()
+    ready.wait(5)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6390
+    print(f"RESP stand-in listening on 127.0.0.1:{port}")
+    asyncio.run(serve(port))
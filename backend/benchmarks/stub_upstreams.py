@@ -0,0 +1,156 @@
+"""Stub NewsAPI and OpenAI servers for benchmarks and replays against a local instance.
+
+Serves ``GET /v2/everything`` (NewsAPI) with a stable set of articles per query
+and ``POST /v1/chat/completions`` (OpenAI) with a valid analysis, each after a
+configurable delay, and counts the calls. Point the API at it with:
+
+    NEWS_API_BASE_URL=http://127.0.0.1:<port>/v2/everything
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+
+Run from the backend directory:
+    python benchmarks/stub_upstreams.py [port]
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubUpstreams:
+    """Both upstreams on one port, in a background thread."""
+
+    def __init__(self, port=0, articles_per_query=20, news_latency=0.2, llm_latency=0.3):
+        self.articles_per_query = articles_per_query
+        self.news_latency = news_latency
+        self.llm_latency = llm_latency
+        self.counts = {"news": 0, "llm": 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    @property
+    def news_url(self):
+        return f"http://127.0.0.1:{self.port}/v2/everything"
+
+    @property
+    def openai_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def env(self):
+        """Environment variables that point the API at these stubs."""
+        return {
+            "NEWS_API_KEY": "stub",
+            "NEWS_API_BASE_URL": self.news_url,
+            "NEWS_PROVIDERS": "newsapi",
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": self.openai_url,
+        }
+
+    def count(self, kind):
+        with self._lock:
+            self.counts[kind] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def articles(self, query):
+        match = re.search(r'"([^"]+)"', query)
+        name = match.group(1) if match else query.split(" OR ")[0]
+        slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+        now = datetime.utcnow()
+        return [
+            {
+                "title": f"{name} shares move after analyst update {i}",
+                "description": f"Analysts revisited their outlook for {name} after the latest results.",
+                "url": f"https://www.reuters.com/markets/{slug}-{i}",
+                "publishedAt": (now - timedelta(hours=6 * i + 1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "source": {"id": "reuters", "name": "Reuters"},
+            }
+            for i in range(self.articles_per_query)
+        ]
+
+    def completion(self):
+        score = round(random.uniform(-1, 1), 2)
+        content = {
+            "summary": "The company reported results in line with expectations.",
+            "sentiment": "positive" if score > 0.15 else "negative" if score < -0.15 else "neutral",
+            "sentiment_score": score,
+            "key_takeaways": ["Results in line", "Guidance unchanged"],
+            "significant_quotes": [],
+        }
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-3.5-turbo",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path == "/v2/everything":
+                    stub.count("news")
+                    time.sleep(stub.news_latency)
+                    query = parse_qs(parts.query).get("q", [""])[0]
+                    articles = stub.articles(query)
+                    self._reply({"status": "ok", "totalResults": len(articles), "articles": articles})
+                elif parts.path == "/_stats":
+                    self._reply(stub.stats())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.rstrip("/") == "/v1/chat/completions":
+                    stub.count("llm")
+                    time.sleep(stub.llm_latency)
+                    self._reply(stub.completion())
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    stubs = StubUpstreams(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8090)
+    print(f"Stub upstreams on 127.0.0.1:{stubs.port}")
+    for key, value in stubs.env().items():
+        print(f"  {key}={value}")
+    stubs.server.serve_forever()
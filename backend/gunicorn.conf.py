@@ -0,0 +1,26 @@
+"""Gunicorn settings for multi-worker mode.
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Workers coordinate caches, rate limits and single-flight locks through the
+shared state layer (SHARED_STATE_BACKEND). It defaults to "memory" for the
+single-worker deployment, so this config switches it to "sqlite" unless it
+is set; use "redis" to share state across hosts.
+"""
+import os
+
+# Read by each worker when it imports the app
+os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Each worker builds its own event loop, HTTP sessions, OpenAI client, monitors and
+# CPU pool after it starts; nothing of that kind may be created before the fork
+preload_app = False
+# An analysis can wait on dozens of OpenAI calls
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import re
+
+import pytest
+from starlette.datastructures import Headers
+
+from app.services import admission_service
+from app.services.admission_service import AdmissionController, AdmissionRejected, client_key, parse_networks
+from app.services.quota_service import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from app.services.shared_state import MemoryBackend, SharedState, SQLiteBackend
+
+
+@pytest.fixture
+def local_state(monkeypatch):
+    monkeypatch.setattr(admission_service, "shared_state", SharedState(MemoryBackend()))
+
+
+@pytest.fixture
+def shared(monkeypatch, tmp_path):
+    state = SharedState(SQLiteBackend(str(tmp_path / "state.sqlite3")))
+    monkeypatch.setattr(admission_service, "shared_state", state)
+    yield state
+    state.close()
+
+
+def controller(**kwargs):
+    settings = {"max_concurrency": 1, "queue_size": 4, "queue_timeout": 30.0, "rate_per_minute": 0, "burst": 5}
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+
+def test_admits_up_to_the_cap_then_queues(local_state):
+    async def scenario():
+        admission = controller(max_concurrency=2)
+        first = await admission.acquire("a")
+        await admission.acquire("b")
+        waiter = asyncio.create_task(admission.acquire("c"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert admission.metrics()["queue_depth"] == 1
+        admission.release(first)
+        await waiter
+        metrics = admission.metrics()
+        assert (metrics["active"], metrics["queue_depth"], metrics["admitted_after_wait"]) == (2, 0, 1)
+
+    asyncio.run(scenario())
+
+
+def test_interactive_waiters_go_first(local_state):
+    async def scenario():
+        admission = controller()
+        started = await admission.acquire("holder")
+        order = []
+
+        async def wait(name, priority):
+            admission.release(await admission.acquire(name, priority))
+            order.append(name)
+
+        background = asyncio.create_task(wait("background", PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(wait("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        admission.release(started)
+        await asyncio.gather(background, interactive)
+        assert order == ["interactive", "background"]
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_predicted_wait_are_refused(local_state):
+    async def scenario():
+        admission = controller(queue_size=1)
+        await admission.acquire("holder")
+        queued = asyncio.create_task(admission.acquire("queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("overflow")
+        assert rejected.value.status_code == 503
+        assert rejected.value.retry_after >= 1
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+        slow = controller(queue_timeout=1.0)
+        slow.service_time = 10.0
+        await slow.acquire("holder")
+        with pytest.raises(AdmissionRejected):
+            await slow.acquire("waiter")
+        assert slow.metrics()["rejected_predicted_wait"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_deadline_expiry_frees_the_queue_slot(local_state):
+    async def scenario():
+        admission = controller(queue_timeout=0.05)
+        admission.service_time = 0.01
+        started = await admission.acquire("holder")
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire("waiter")
+        assert admission.metrics()["queue_depth"] == 0
+        admission.release(started)
+        assert admission.metrics()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_limits_each_client(local_state):
+    async def scenario():
+        admission = controller(max_concurrency=100, rate_per_minute=60, burst=2)
+        for _ in range(2):
+            await admission.acquire("ip:1.1.1.1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("ip:1.1.1.1")
+        assert rejected.value.status_code == 429
+        await admission.acquire("ip:2.2.2.2")
+        # Internal callers without a client skip the rate limit
+        await admission.acquire(None)
+        assert admission.metrics()["rate_limiter"] == "token_bucket"
+
+    asyncio.run(scenario())
+
+
+def test_shared_sliding_window_limits_each_client(shared):
+    async def scenario():
+        admission = controller(max_concurrency=100, rate_per_minute=60, burst=2)
+        for _ in range(2):
+            await admission.acquire("ip:1.1.1.1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("ip:1.1.1.1")
+        assert rejected.value.status_code == 429
+        await admission.acquire("ip:2.2.2.2")
+        assert admission.metrics()["rate_limiter"] == "sliding_window"
+
+    asyncio.run(scenario())
+
+
+def headers(*pairs):
+    return Headers(raw=[(name.encode(), value.encode()) for name, value in pairs])
+
+
+def test_client_key_ignores_client_chosen_headers():
+    spoofed = headers(("x-client-id", "fresh"), ("x-forwarded-for", "6.6.6.6"))
+    assert client_key(spoofed, "1.2.3.4", []) == "ip:1.2.3.4"
+    # Forwarded addresses from an untrusted peer are ignored too
+    assert client_key(spoofed, "1.2.3.4", parse_networks("10.0.0.0/8")) == "ip:1.2.3.4"
+    assert client_key(headers(), None, []) == "ip:unknown"
+
+
+def test_client_key_takes_the_hop_the_trusted_proxy_appended():
+    proxies = parse_networks("10.0.0.0/8, 127.0.0.1")
+    # The client prepended 6.6.6.6; the edge proxy appended the real address 5.5.5.5
+    chain = headers(("x-forwarded-for", "6.6.6.6, 5.5.5.5, 10.0.0.7"))
+    assert client_key(chain, "127.0.0.1", proxies) == "ip:5.5.5.5"
+    repeated = headers(("x-forwarded-for", "6.6.6.6"), ("x-forwarded-for", "5.5.5.5"))
+    assert client_key(repeated, "10.1.1.1", proxies) == "ip:5.5.5.5"
+    assert client_key(headers(), "127.0.0.1", proxies) == "ip:127.0.0.1"
+
+
+def test_render_config_keys_each_forwarded_client_separately(local_state):
+    with open(os.path.join(os.path.dirname(__file__), "..", "render.yaml")) as f:
+        setting = re.search(r"key: TRUSTED_PROXIES\s+value: (\S+)", f.read())
+    proxies = parse_networks(setting.group(1))
+
+    async def scenario():
+        admission = controller(max_concurrency=100, rate_per_minute=60, burst=2)
+        # Every request reaches the service from the load balancer's private address
+        first = client_key(headers(("x-forwarded-for", "203.0.113.5")), "10.201.4.9", proxies)
+        second = client_key(headers(("x-forwarded-for", "198.51.100.7")), "10.201.4.9", proxies)
+        assert (first, second) == ("ip:203.0.113.5", "ip:198.51.100.7")
+        for _ in range(2):
+            await admission.acquire(first)
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire(first)
+        await admission.acquire(second)
+
+    asyncio.run(scenario())
@@ -0,0 +1,57 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models import NewsArticle
+from app.services import analysis_service
+from app.services.validation_service import validation_stats
+
+VALID = {
+    "summary": "Results beat expectations.",
+    "sentiment": "positive",
+    "sentiment_score": 0.6,
+    "key_takeaways": ["Revenue up"],
+    "significant_quotes": [],
+}
+
+
+def article(title):
+    return NewsArticle(title=title, description="d", source="Reuters", url=f"https://reuters.com/{title}",
+                       published_at=datetime(2024, 3, 1, 12))
+
+
+@pytest.fixture
+def outcomes():
+    before = validation_stats.outcomes.copy()
+    return lambda: validation_stats.outcomes - before
+
+
+def complete_with(*replies):
+    """A fake _complete returning each reply in turn; exceptions are raised."""
+    replies = list(replies)
+
+    async def complete(messages):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    return complete
+
+
+def test_an_invalid_field_is_reasked(monkeypatch, outcomes):
+    invalid = json.dumps({**VALID, "sentiment_score": "n/a"})
+    monkeypatch.setattr(analysis_service, "_complete", complete_with(invalid, json.dumps({"sentiment_score": 0.2})))
+    pairs = asyncio.run(analysis_service.analyze_article_pairs([article("a")]))
+    assert pairs[0][1].sentiment_score == 0.2
+    assert outcomes() == {"reasked": 1}
+
+
+@pytest.mark.parametrize("reask_reply", [json.dumps({"sentiment_score": "n/a"}), ConnectionError("timeout")])
+def test_a_failed_reask_is_counted_once(monkeypatch, outcomes, reask_reply):
+    invalid = json.dumps({**VALID, "sentiment_score": "n/a"})
+    monkeypatch.setattr(analysis_service, "_complete", complete_with(invalid, reask_reply))
+    assert asyncio.run(analysis_service.analyze_article_pairs([article("a")])) == []
+    assert outcomes() == {"failed": 1}
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import main
+from app.models import StockAnalysisRequest
+from app.services.capture_service import TrafficCapture
+from app.services.profiling_service import Profiler, annotate, current_timer, stage
+
+
+def records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_record_fields_and_anonymity(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    capture = TrafficCapture(str(path), salt="pepper")
+
+    async def scenario():
+        captured = capture.begin()
+        with stage("fetch_news"):
+            await asyncio.sleep(0.01)
+        annotate(articles=20, new_analyses=3)
+        await capture.finish(captured, "ip:203.0.113.5", "aapl", "interactive", 200)
+        # Timing stops with the request
+        assert current_timer() is None
+
+    asyncio.run(scenario())
+    [record] = records(path)
+    assert set(record) == {"ts", "client", "ticker", "priority", "status", "duration_ms", "stages", "articles", "new_analyses"}
+    assert (record["ticker"], record["priority"], record["status"]) == ("AAPL", "interactive", 200)
+    assert record["stages"]["fetch_news"] >= 10
+    assert record["duration_ms"] >= record["stages"]["fetch_news"]
+    assert (record["articles"], record["new_analyses"]) == (20, 3)
+    assert "203.0.113.5" not in path.read_text()
+
+
+def test_client_hash_is_stable_for_a_salt():
+    client = "ip:203.0.113.5"
+    first, second = TrafficCapture("", salt="pepper"), TrafficCapture("", salt="pepper")
+    assert first.anonymize(client) == second.anonymize(client)
+    assert len(first.anonymize(client)) == 12
+    assert first.anonymize(client) != first.anonymize("ip:198.51.100.7")
+    assert TrafficCapture("", salt="salt").anonymize(client) != first.anonymize(client)
+    # Without a configured salt each process picks its own
+    assert TrafficCapture("").anonymize(client) != TrafficCapture("").anonymize(client)
+
+
+def test_profiled_requests_share_the_profilers_timer(tmp_path):
+    capture = TrafficCapture(str(tmp_path / "capture.jsonl"), salt="pepper")
+    profiler = Profiler(admin_token="s3cret")
+
+    async def scenario():
+        profile, token = profiler.start("POST /api/analyze AAPL")
+        captured = capture.begin()
+        assert captured.timer is profile and captured.token is None
+        with stage("report"):
+            pass
+        await capture.finish(captured, "ip:1.2.3.4", "AAPL", "interactive", 200)
+        # Finishing the capture leaves the profile running
+        assert current_timer() is profile
+        profiler.finish(profile, token)
+        assert current_timer() is None
+
+    asyncio.run(scenario())
+    assert "report" in records(tmp_path / "capture.jsonl")[0]["stages"]
+
+
+def http_request():
+    return Request({"type": "http", "method": "POST", "path": "/api/analyze", "headers": [], "client": ("203.0.113.5", 5000)})
+
+
+@pytest.mark.parametrize("error, status", [
+    (asyncio.CancelledError(), 499),
+    (RuntimeError("boom"), 500),
+    (HTTPException(status_code=429, detail="slow down"), 429),
+])
+def test_failed_requests_are_not_captured_as_200(monkeypatch, tmp_path, error, status):
+    path = tmp_path / "capture.jsonl"
+    monkeypatch.setattr(main, "traffic_capture", TrafficCapture(str(path), salt="pepper"))
+
+    async def run_analysis(request, client, priority):
+        raise error
+
+    monkeypatch.setattr(main, "run_analysis", run_analysis)
+
+    async def scenario():
+        with pytest.raises(type(error)):
+            await main.analyze_stock(StockAnalysisRequest(ticker="AAPL"), http_request(), Response(), None, None)
+
+    asyncio.run(scenario())
+    assert records(path)[0]["status"] == status
@@ -0,0 +1,96 @@
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+
+import pytest
+
+from app.models import ArticleAnalysis, NewsArticle
+from app.services import export_service
+from app.services.analysis_archive import AnalysisArchive
+from app.services.compact_store import CompactAnalysis, CompactArticle
+from app.services.export_service import ExportUnavailableError, export_stream, stream_parquet
+
+
+def entry(url, day, score=0.4):
+    article = NewsArticle(
+        title=f"Story {url}", description="d", source="Reuters", url=url, published_at=datetime(2024, 3, day, 12)
+    )
+    analysis = ArticleAnalysis(
+        summary="s", sentiment="positive", sentiment_score=score,
+        key_takeaways=["one", "two"], significant_quotes=["quote"],
+    )
+    return CompactArticle.from_model(article), CompactAnalysis.from_model(analysis)
+
+
+@pytest.fixture
+def archive(monkeypatch, tmp_path):
+    archive = AnalysisArchive(str(tmp_path))
+    asyncio.run(archive.add("AAPL", [entry("https://a", 1), entry("https://b", 2, -0.3)]))
+    asyncio.run(archive.add("MSFT", [entry("https://c", 3)]))
+    monkeypatch.setattr(export_service, "analysis_archive", archive)
+    return archive
+
+
+def read(fmt, tickers, start=None, end=None):
+    return b"".join(export_stream(fmt, tickers, start, end))
+
+
+def test_csv_flattens_lists_and_covers_every_ticker(archive):
+    rows = list(csv.DictReader(io.StringIO(read("csv", ["AAPL", "MSFT"]).decode())))
+    assert [(row["ticker"], row["url"]) for row in rows] == [("AAPL", "https://a"), ("AAPL", "https://b"), ("MSFT", "https://c")]
+    assert rows[0]["key_takeaways"] == "one | two"
+    assert rows[0]["published_at"] == "2024-03-01T12:00:00Z"
+    assert rows[1]["sentiment_score"] == "-0.3"
+
+
+def test_ndjson_filters_by_publish_date(archive):
+    lines = read("ndjson", ["AAPL"], start=date(2024, 3, 2), end=date(2024, 3, 2)).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [row["url"] for row in rows] == ["https://b"]
+    assert rows[0]["key_takeaways"] == ["one", "two"]
+    assert list(rows[0]) == export_service.FIELDS
+
+
+def test_streams_in_chunks(archive):
+    rows = export_service.iter_rows(["AAPL", "MSFT"])
+    assert len(list(export_service.stream_ndjson(rows, chunk_rows=2))) == 2
+    # Header and first chunk, then the second chunk
+    assert len(list(export_service.stream_csv(export_service.iter_rows(["AAPL", "MSFT"]), chunk_rows=2))) == 2
+
+
+def test_parquet_round_trip(archive):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(read("parquet", ["AAPL", "MSFT"])))
+    assert table.num_rows == 3
+    assert table.column("url").to_pylist() == ["https://a", "https://b", "https://c"]
+    assert table.column("key_takeaways").to_pylist()[0] == ["one", "two"]
+    assert table.column("published_at").to_pylist()[0].isoformat() == "2024-03-01T12:00:00+00:00"
+
+
+def test_parquet_without_pyarrow_is_unavailable(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ExportUnavailableError):
+        stream_parquet(iter([]))
+
+
+def test_unknown_format_and_tickers(archive):
+    with pytest.raises(ValueError):
+        export_stream("xlsx", ["AAPL"])
+    assert read("ndjson", ["NFLX"]) == b""
+    assert read("csv", ["NFLX"]).decode().strip() == ",".join(export_service.FIELDS)
+
+
+def test_archive_skips_torn_lines(archive, tmp_path):
+    with open(tmp_path / "AAPL.ndjson", "a", encoding="utf-8") as f:
+        f.write('{"published_ts": 1709294400, "url": "https://torn"')
+    asyncio.run(archive.add("AAPL", [entry("https://d", 4)]))
+    urls = [record["url"] for record in archive.iter_records("AAPL")]
+    # Only the torn write is lost; the next batch starts on a fresh line
+    assert urls == ["https://a", "https://b", "https://d"]
+    with open(tmp_path / "AAPL.ndjson", "a", encoding="utf-8") as f:
+        f.write('{"published_ts": 1709')
+    assert [record["url"] for record in archive.iter_records("AAPL")] == urls
+    assert archive.metrics()["appended"] == 4
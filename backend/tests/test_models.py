@@ -0,0 +1,17 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models import StockAnalysisRequest, normalize_ticker
+
+
+@pytest.mark.parametrize("value, expected", [("AAPL", "AAPL"), (" msft ", "MSFT"), ("brk.b", "BRK.B"), ("BF-B", "BF-B")])
+def test_normalize_ticker(value, expected):
+    assert normalize_ticker(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "../PWNED", "AAPL/X", "1ABC", "TOOLONGTICKER", "A B", "AA\nPL"])
+def test_rejects_non_symbols(value):
+    with pytest.raises(ValueError):
+        normalize_ticker(value)
+    with pytest.raises(ValidationError):
+        StockAnalysisRequest(ticker=value)
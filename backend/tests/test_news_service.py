@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import news_providers, news_service
+from app.services.news_providers import NewsProvider, format_published_at, parse_feed
+from app.services.news_service import dedupe_key, get_news_articles
+
+
+def article(url, title="Apple Inc. shares climb after earnings", hours_ago=1, source="Reuters",
+            description="Apple reported record revenue."):
+    published_at = datetime.utcnow() - timedelta(hours=hours_ago)
+    return {
+        "source": {"id": None, "name": source},
+        "title": title,
+        "description": description,
+        "url": url,
+        "publishedAt": format_published_at(published_at),
+    }
+
+
+class FakeProvider(NewsProvider):
+    def __init__(self, name, articles, delay=0.0):
+        super().__init__(timeout=5)
+        self.name = name
+        self.articles = articles
+        self.delay = delay
+        self.cancelled = False
+
+    async def fetch(self, ticker, start_date, end_date):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.articles
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(news_service, "_recent_results", OrderedDict())
+
+
+def test_providers_need_a_fetch():
+    with pytest.raises(TypeError):
+        NewsProvider()
+
+
+def test_dedupe_key_normalizes_urls():
+    assert dedupe_key("HTTPS://www.Reuters.com/markets/apple/#top") == "https://reuters.com/markets/apple"
+    assert dedupe_key("https://reuters.com/a?id=1") != dedupe_key("https://reuters.com/a?id=2")
+    # Only a leading "www." is dropped
+    assert dedupe_key("https://shop.www.reuters.com/a") == "https://shop.www.reuters.com/a"
+
+
+def test_the_same_story_from_two_providers_is_merged_once():
+    first = FakeProvider("first", [
+        article("https://www.reuters.com/apple-earnings/", hours_ago=2),
+        article("https://www.reuters.com/apple-buyback", hours_ago=3),
+    ])
+    second = FakeProvider("second", [
+        article("https://reuters.com/apple-earnings", hours_ago=2),
+        article("https://cnbc.com/apple-iphone", hours_ago=1, source="CNBC"),
+        article("https://example.com/apple", source="Some Blog"),
+        article("https://cnbc.com/fed", title="Fed holds rates steady", source="CNBC", description=""),
+    ])
+    articles = asyncio.run(get_news_articles("AAPL", providers=[first, second], first_n=0))
+    # Newest first, the duplicate once, the blog and the off-topic story dropped
+    assert [dedupe_key(a["url"]) for a in articles] == [
+        "https://cnbc.com/apple-iphone", "https://reuters.com/apple-earnings", "https://reuters.com/apple-buyback",
+    ]
+
+
+def test_first_n_returns_without_waiting_for_slow_providers():
+    fast = FakeProvider("fast", [article("https://reuters.com/a"), article("https://reuters.com/b")])
+    slow = FakeProvider("slow", [article("https://reuters.com/c")], delay=10)
+
+    async def scenario():
+        started = time.monotonic()
+        articles = await get_news_articles("AAPL", providers=[fast, slow], first_n=2)
+        assert time.monotonic() - started < 5
+        await asyncio.sleep(0)
+        return articles
+
+    articles = asyncio.run(scenario())
+    assert {a["url"] for a in articles} == {"https://reuters.com/a", "https://reuters.com/b"}
+    assert slow.cancelled
+
+
+def test_one_failing_provider_does_not_fail_the_request():
+    class Broken(FakeProvider):
+        async def fetch(self, ticker, start_date, end_date):
+            raise ValueError("HTTP 503")
+
+    ok = FakeProvider("ok", [article("https://reuters.com/a")])
+    articles = asyncio.run(get_news_articles("AAPL", providers=[Broken("broken", []), ok], first_n=0))
+    assert [a["url"] for a in articles] == ["https://reuters.com/a"]
+    with pytest.raises(Exception, match="broken: HTTP 503"):
+        asyncio.run(get_news_articles("MSFT", providers=[Broken("broken", [])], first_n=0))
+
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item>
+    <title> Apple beats estimates </title>
+    <link>https://finance.yahoo.com/news/apple-beats</link>
+    <description>Record quarter.</description>
+    <pubDate>Tue, 05 Mar 2024 14:30:00 -0500</pubDate>
+  </item>
+  <item><title>No date</title><link>https://finance.yahoo.com/news/no-date</link></item>
+  <item>
+    <title>Bad date</title><link>https://finance.yahoo.com/news/bad-date</link>
+    <pubDate>yesterday</pubDate>
+  </item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <title>Apple opens a new campus</title>
+    <link href="https://www.marketwatch.com/story/apple-campus"/>
+    <summary>Austin expansion.</summary>
+    <updated>2024-03-06T09:00:00+01:00</updated>
+  </entry>
+  <entry><title>No link</title><updated>2024-03-06T09:00:00Z</updated></entry>
+</feed>"""
+
+
+def test_parse_rss_feed():
+    assert parse_feed(RSS, "Yahoo Finance") == [{
+        "source": {"id": None, "name": "Yahoo Finance"},
+        "title": "Apple beats estimates",
+        "description": "Record quarter.",
+        "url": "https://finance.yahoo.com/news/apple-beats",
+        "publishedAt": "2024-03-05T19:30:00Z",
+    }]
+
+
+def test_parse_atom_feed():
+    articles = parse_feed(ATOM, "MarketWatch")
+    assert [(a["title"], a["url"], a["publishedAt"]) for a in articles] == [
+        ("Apple opens a new campus", "https://www.marketwatch.com/story/apple-campus", "2024-03-06T08:00:00Z"),
+    ]
+    assert articles[0]["description"] == "Austin expansion."
+
+
+def test_a_session_from_a_finished_loop_is_closed_not_leaked(monkeypatch, caplog):
+    monkeypatch.setattr(news_providers, "_session", None)
+    monkeypatch.setattr(news_providers, "_session_loop", None)
+
+    async def session():
+        return news_providers.get_session()
+
+    old = asyncio.run(session())
+    assert not old.closed
+
+    async def scenario():
+        new = news_providers.get_session()
+        assert new is not old and news_providers.get_session() is new
+        await news_providers.close_session()
+
+    asyncio.run(scenario())
+    assert old.closed
+    assert "left open by a stopped event loop" in caplog.text
+
+
+def test_a_session_on_a_running_loop_is_closed_there(monkeypatch):
+    monkeypatch.setattr(news_providers, "_session", None)
+    monkeypatch.setattr(news_providers, "_session_loop", None)
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever)
+    thread.start()
+    try:
+        async def session():
+            return news_providers.get_session()
+
+        old = asyncio.run_coroutine_threadsafe(session(), other).result(timeout=5)
+
+        async def scenario():
+            news_providers.get_session()
+            await news_providers.close_session()
+
+        asyncio.run(scenario())
+        # The close was scheduled on the loop the session belongs to
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), other).result(timeout=5)
+        assert old.closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(timeout=5)
+        other.close()
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.models import ArticleAnalysis, NewsArticle
+from app.services import pipeline_service
+from app.services.analysis_archive import AnalysisArchive
+from app.services.compact_store import ArticleStore
+from app.services.rollup_service import RollupStore
+
+
+def article(title, url=""):
+    return NewsArticle(title=title, description="d", source="Reuters", url=url, published_at=datetime(2024, 3, 1, 12))
+
+
+@pytest.fixture
+def analyzed(monkeypatch, tmp_path):
+    """Titles sent to the (fake) LLM."""
+    calls = []
+
+    async def analyze_article_pairs(articles):
+        calls.extend(a.title for a in articles)
+        return [
+            (a, ArticleAnalysis(summary=a.title, sentiment="neutral", sentiment_score=0.0,
+                                key_takeaways=[], significant_quotes=[]))
+            for a in articles
+        ]
+
+    monkeypatch.setattr(pipeline_service, "analyze_article_pairs", analyze_article_pairs)
+    monkeypatch.setattr(pipeline_service, "article_store", ArticleStore())
+    monkeypatch.setattr(pipeline_service, "rollup_store", RollupStore(str(tmp_path / "rollups")))
+    monkeypatch.setattr(pipeline_service, "analysis_archive", AnalysisArchive(str(tmp_path / "archive")))
+    return calls
+
+
+def test_articles_without_a_url_are_reused_by_title(analyzed):
+    articles = [article("First"), article("Second"), article("Linked", "https://reuters.com/a")]
+    analyses, added = asyncio.run(pipeline_service.analyze_with_store("AAPL", articles))
+    # Each URL-less article keeps its own analysis instead of colliding on ""
+    assert [a.summary for a in analyses] == ["First", "Second", "Linked"]
+    assert len(added) == 3
+
+    analyses, added = asyncio.run(pipeline_service.analyze_with_store("AAPL", articles))
+    assert [a.summary for a in analyses] == ["First", "Second", "Linked"]
+    assert added == []
+    assert analyzed == ["First", "Second", "Linked"]
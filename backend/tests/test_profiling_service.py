@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.profiling_service import Profiler, current_timer, stage
+
+
+def test_admin_token_required_and_compared_exactly():
+    assert not Profiler(admin_token="").is_admin("")
+    assert not Profiler(admin_token="").is_admin(None)
+    profiler = Profiler(admin_token="s3cret")
+    assert profiler.is_admin("s3cret")
+    assert not profiler.is_admin("s3cre")
+    assert not profiler.is_admin(None)
+    assert profiler.should_profile("s3cret")
+    assert not profiler.should_profile("wrong")
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profile_request(profiler, body, name="POST /api/analyze AAPL"):
+    async def scenario():
+        profile, token = profiler.start(name)
+        try:
+            await body()
+        finally:
+            profiler.finish(profile, token)
+        return profile
+
+    return asyncio.run(scenario())
+
+
+async def two_stages():
+    with stage("fetch_news"):
+        await asyncio.sleep(0.15)
+    with stage("convert"):
+        busy(0.15)
+
+
+def test_samples_are_split_into_cpu_and_wait_per_stage():
+    profile = profile_request(Profiler(admin_token="s3cret", interval_ms=2), two_stages)
+    stages = profile.summary()["stages"]
+    assert stages["fetch_news"]["wall_ms"] >= 150
+    assert stages["fetch_news"]["wait_ms"] > 10 * stages["fetch_news"]["cpu_ms"]
+    assert stages["convert"]["cpu_ms"] > 10 * stages["convert"]["wait_ms"]
+    assert stages["convert"]["cpu_ms"] > 75
+
+
+def test_speedscope_and_folded_exports():
+    profile = profile_request(Profiler(admin_token="s3cret", interval_ms=2), two_stages)
+    speedscope = profile.to_speedscope()
+    frames = speedscope["shared"]["frames"]
+    [sampled] = speedscope["profiles"]
+    assert sampled["type"] == "sampled" and sampled["unit"] == "milliseconds"
+    assert len(sampled["samples"]) == len(sampled["weights"])
+    assert sampled["endValue"] == pytest.approx(sum(sampled["weights"]))
+    assert all(0 <= index < len(frames) for stack in sampled["samples"] for index in stack)
+    names = {frame["name"] for frame in frames}
+    assert {"stage:fetch_news", "stage:convert", "[cpu]", "[wait]"} <= names
+    busy_frame = next(frame for frame in frames if frame["name"] == "busy")
+    assert busy_frame["file"] == "test_profiling_service.py" and busy_frame["line"] > 0
+
+    lines = profile.to_folded().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.startswith("stage:convert;[cpu];") and ";busy (" in line for line in lines)
+    assert any(line.startswith("stage:fetch_news;[wait];") for line in lines)
+
+
+def test_only_the_newest_profiles_are_kept():
+    profiler = Profiler(admin_token="s3cret", max_stored=2)
+
+    async def nothing():
+        pass
+
+    ids = [profile_request(profiler, nothing, name=f"request {i}").id for i in range(3)]
+    assert profiler.get(ids[0]) is None
+    assert [summary["id"] for summary in profiler.list()] == [ids[2], ids[1]]
+
+
+def test_concurrent_tasks_keep_their_own_stages():
+    profiler = Profiler(admin_token="s3cret")
+    seen = {}
+
+    async def body():
+        profile = current_timer()
+        a_entered, b_entered, a_left = asyncio.Event(), asyncio.Event(), asyncio.Event()
+
+        async def child_a():
+            with stage("fetch_news"):
+                a_entered.set()
+                await b_entered.wait()
+            a_left.set()
+
+        async def child_b():
+            await a_entered.wait()
+            with stage("analyze"):
+                b_entered.set()
+                await a_left.wait()
+                # With one shared stack, child A leaving its stage would have popped this one
+                seen["b"] = profile.stage_of(asyncio.current_task())
+                seen["parent"] = profile.stage_of(profile.task)
+
+        with stage("gather"):
+            await asyncio.gather(child_a(), child_b())
+        seen["after"] = profile.stage_of(profile.task)
+
+    profile_request(profiler, body)
+    assert seen == {"b": "analyze", "parent": "gather", "after": "request"}
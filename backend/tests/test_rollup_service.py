@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from app.models import ArticleAnalysis, NewsArticle
+from app.services.compact_store import CompactAnalysis, CompactArticle
+from app.services.rollup_service import RollupStore, TickerRollups, to_day
+
+
+def build(points):
+    rollups = TickerRollups()
+    for day, score, source in points:
+        rollups.add(to_day(day), score, source)
+    return rollups
+
+
+def test_add_keeps_days_sorted_and_aggregates():
+    rollups = build([
+        (date(2024, 3, 2), 0.5, "Reuters"),
+        (date(2024, 3, 1), -0.2, "CNBC"),
+        (date(2024, 3, 2), -0.1, "CNBC"),
+    ])
+    points = rollups.query(to_day(date(2024, 1, 1)), to_day(date(2024, 12, 31)))
+    assert [p["date"] for p in points] == ["2024-03-01", "2024-03-02"]
+    day = points[1]
+    assert day["count"] == 2
+    assert day["mean"] == pytest.approx(0.2)
+    # Reuters is weighted 1.5, CNBC 1.0
+    assert day["weighted_mean"] == pytest.approx((1.5 * 0.5 - 0.1) / 2.5)
+    assert (day["min"], day["max"]) == (-0.1, 0.5)
+    assert day["sources"] == {"Reuters": 1, "CNBC": 1}
+
+
+def test_query_bounds_are_inclusive():
+    rollups = build([(date(2024, 3, d), 0.1, "Reuters") for d in (1, 2, 3, 4)])
+    points = rollups.query(to_day(date(2024, 3, 2)), to_day(date(2024, 3, 3)))
+    assert [p["date"] for p in points] == ["2024-03-02", "2024-03-03"]
+
+
+def test_bytes_round_trip():
+    rollups = build([
+        (date(2023, 12, 31), 0.9, "Bloomberg"),
+        (date(2024, 1, 1), -0.75, "The Wall Street Journal"),
+        (date(2024, 1, 1), 0.25, "Yahoo Finance"),
+    ])
+    restored = TickerRollups.from_bytes(rollups.to_bytes())
+    assert len(restored) == len(rollups)
+    for name in rollups.columns:
+        assert restored.columns[name] == rollups.columns[name]
+        assert restored.columns[name].typecode == rollups.columns[name].typecode
+    assert restored.sources == rollups.sources
+    assert restored.query(0, 2 ** 31 - 1) == rollups.query(0, 2 ** 31 - 1)
+
+
+def test_counted_articles_survive_the_round_trip():
+    rollups = TickerRollups()
+    assert rollups.add(to_day(date(2024, 3, 1)), 0.5, "Reuters", "https://a")
+    assert not rollups.add(to_day(date(2024, 3, 1)), 0.5, "Reuters", "https://a")
+    restored = TickerRollups.from_bytes(rollups.to_bytes())
+    assert not restored.add(to_day(date(2024, 3, 1)), 0.5, "Reuters", "https://a")
+    assert restored.add(to_day(date(2024, 3, 1)), 0.1, "CNBC", "https://b")
+
+
+def test_version_1_files_still_load():
+    rollups = build([(date(2024, 3, 1), 0.5, "Reuters")])
+    data = rollups.to_bytes()
+    legacy = data[:data.rindex(b"\n")].replace(b'"version": 2', b'"version": 1')
+    restored = TickerRollups.from_bytes(legacy)
+    assert restored.query(0, 2 ** 31 - 1) == rollups.query(0, 2 ** 31 - 1)
+    assert restored.keys == [set()]
+
+
+def entry(url, score=0.4):
+    article = NewsArticle(
+        title="Apple beats estimates", description="", source="Reuters", url=url, published_at=datetime(2024, 3, 1, 15)
+    )
+    analysis = ArticleAnalysis(
+        summary="s", sentiment="positive", sentiment_score=score, key_takeaways=["k"], significant_quotes=[]
+    )
+    return CompactArticle.from_model(article), CompactAnalysis.from_model(analysis)
+
+
+def test_reanalyzed_articles_are_not_counted_again_after_a_restart(tmp_path):
+    directory = str(tmp_path / "rollups")
+    assert len(asyncio.run(RollupStore(directory).add("AAPL", [entry("https://a")]))) == 1
+    # A new process has an empty article store, so it re-analyzes and re-adds the same article
+    restarted = RollupStore(directory)
+    counted = asyncio.run(restarted.add("AAPL", [entry("https://a"), entry("https://b", -0.2)]))
+    assert [article.url for article, _ in counted] == ["https://b"]
+    [day] = asyncio.run(RollupStore(directory).query("AAPL", None, None))
+    assert day["count"] == 2
+    assert day["sum"] == pytest.approx(0.2)
+
+
+def test_empty_round_trip():
+    restored = TickerRollups.from_bytes(TickerRollups().to_bytes())
+    assert len(restored) == 0
+    assert restored.sources == []
+
+
+def test_store_rejects_tickers_that_are_not_symbols(tmp_path):
+    store = RollupStore(str(tmp_path / "rollups"))
+    for ticker in ("../PWNED", "AAPL/../X", "", "aapl", "AAPL\n"):
+        with pytest.raises(ValueError):
+            store._path(ticker)
+    with pytest.raises(ValueError):
+        asyncio.run(store.query("../PWNED", None, None))
+    assert list(tmp_path.iterdir()) == []
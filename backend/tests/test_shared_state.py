@@ -0,0 +1,213 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from app.services import admission_service, shared_state as shared_state_module
+from app.services.admission_service import AdmissionController
+from app.services.shared_state import MemoryBackend, RedisBackend, SharedState, SQLiteBackend, StateBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    backend = MemoryBackend() if request.param == "memory" else SQLiteBackend(str(tmp_path / "state.sqlite3"))
+    yield backend
+    backend.close()
+
+
+def test_get_set_and_expiry(backend):
+    backend.set_many({"a": b"1", "b": b"2"}, ttl=60)
+    backend.set_many({"short": b"3"}, ttl=0.05)
+    assert backend.get_many(["a", "b", "short", "missing"]) == {"a": b"1", "b": b"2", "short": b"3"}
+    time.sleep(0.1)
+    assert backend.get_many(["a", "short"]) == {"a": b"1"}
+    assert backend.get_many([]) == {}
+
+
+def test_incr_starts_a_counter_with_a_ttl(backend):
+    assert [backend.incr("rate", ttl=0.05) for _ in range(3)] == [1, 2, 3]
+    time.sleep(0.1)
+    assert backend.incr("rate", ttl=60) == 1
+
+
+def test_locks_belong_to_their_owner(backend):
+    assert backend.try_lock("lock:x", "first", ttl=60)
+    assert not backend.try_lock("lock:x", "second", ttl=60)
+    # Only the holder can release it
+    backend.unlock("lock:x", "second")
+    assert not backend.try_lock("lock:x", "second", ttl=60)
+    backend.unlock("lock:x", "first")
+    assert backend.try_lock("lock:x", "second", ttl=60)
+    # An expired lock can be taken over
+    assert backend.try_lock("lock:y", "first", ttl=0.05)
+    time.sleep(0.1)
+    assert backend.try_lock("lock:y", "second", ttl=60)
+
+
+def test_sqlite_state_is_visible_to_other_instances(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    first.set_many({"news:AAPL": b"[]"}, ttl=60)
+    assert second.get_many(["news:AAPL"]) == {"news:AAPL": b"[]"}
+    first.incr("rate", ttl=60)
+    assert second.incr("rate", ttl=60) == 2
+
+
+def test_json_round_trip_and_stats(backend):
+    async def scenario():
+        state = SharedState(backend)
+        await state.set_json({"analysis:https://a": {"score": 0.5}})
+        assert await state.get_json(["analysis:https://a", "analysis:https://b"]) == {"analysis:https://a": {"score": 0.5}}
+        assert await state.incr("rate", ttl=60) == 1
+        assert await state.count("rate") == 1
+        metrics = state.metrics()
+        assert (metrics["hits"], metrics["misses"], metrics["writes"]) == (1, 1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_lock_coalesces_callers_and_reports_waiting(backend):
+    async def scenario():
+        state = SharedState(backend)
+        running = []
+        results = []
+
+        async def single_flight(name):
+            async with state.lock("analyze:AAPL", ttl=5, wait=5) as waited:
+                running.append(name)
+                assert len(running) == 1
+                await asyncio.sleep(0.02)
+                running.remove(name)
+                results.append((name, waited))
+
+        await asyncio.gather(*(single_flight(name) for name in ("a", "b", "c")))
+        assert results == [("a", False), ("b", True), ("c", True)]
+        assert state.metrics()["lock_waits"] == 2
+        # The lock is released and its local bookkeeping dropped
+        assert state._local_locks == {}
+        assert backend.try_lock("lock:analyze:AAPL", "other", ttl=1)
+
+    asyncio.run(scenario())
+
+
+def test_lock_waits_for_another_process_then_gives_up(backend):
+    async def scenario():
+        state = SharedState(backend)
+        # Another worker holds the lock and never releases it
+        backend.try_lock("lock:analyze:AAPL", "other-worker", ttl=60)
+        started = time.monotonic()
+        async with state.lock("analyze:AAPL", ttl=5, wait=0.1) as waited:
+            assert waited
+        assert time.monotonic() - started >= 0.1
+        assert state.metrics()["lock_timeouts"] == 1
+
+    asyncio.run(scenario())
+
+
+class BrokenBackend(StateBackend):
+    def get_many(self, keys):
+        raise OSError("disk full")
+
+    set_many = incr = try_lock = unlock = get_many
+
+
+def test_a_failing_backend_degrades_instead_of_failing():
+    async def scenario():
+        state = SharedState(BrokenBackend())
+        assert await state.get_json(["a"]) == {}
+        await state.set_json({"a": 1})
+        assert await state.incr("rate", ttl=60) == 0
+        async with state.lock("analyze:AAPL", wait=1) as waited:
+            assert not waited
+        assert state.metrics()["errors"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_shared_sliding_window(monkeypatch, tmp_path):
+    state = SharedState(SQLiteBackend(str(tmp_path / "state.sqlite3")))
+    monkeypatch.setattr(admission_service, "shared_state", state)
+    admission = AdmissionController(rate_per_minute=60, burst=3)
+    # A 3s window: 2.7s into window 100, right after two requests in window 99
+    monkeypatch.setattr(admission_service.time, "time", lambda: 302.7)
+    state.backend.set_many({"rate:ip:1:99": b"2"}, ttl=60)
+
+    async def scenario():
+        # 2 * (1 - 0.9) from the previous window + the current count
+        assert await admission._take_shared("ip:1") == (True, 0.0)
+        assert await admission._take_shared("ip:1") == (True, 0.0)
+        allowed, retry_after = await admission._take_shared("ip:1")
+        assert not allowed
+        assert retry_after == pytest.approx(0.3)
+        # Other clients have their own windows
+        assert (await admission._take_shared("ip:2"))[0]
+
+    asyncio.run(scenario())
+
+
+class FakeRedis:
+    """One end of a socket pair; a thread on the other end reads a request and answers with canned bytes."""
+
+    def __init__(self, reply):
+        self.client, self.server = socket.socketpair()
+        self.received = b""
+        self._thread = threading.Thread(target=self._answer, args=(reply,))
+        self._thread.start()
+
+    def _answer(self, reply):
+        self.received = self.server.recv(65536)
+        if not self.received:
+            return
+        if reply is None:
+            # Drop the connection without answering
+            self.server.close()
+        else:
+            self.server.sendall(reply)
+
+    def join(self):
+        self._thread.join(timeout=5)
+        self.server.close()
+
+
+def redis_backend(monkeypatch, *fakes):
+    backend = RedisBackend("redis://127.0.0.1:6379/0")
+    pending = list(fakes)
+    monkeypatch.setattr(shared_state_module.socket, "create_connection", lambda address, timeout: pending.pop(0).client)
+    return backend, pending
+
+
+def test_redis_incr_sets_the_ttl_in_the_same_round_trip(monkeypatch):
+    fake = FakeRedis(b"+OK\r\n:1\r\n")
+    backend, _ = redis_backend(monkeypatch, fake)
+    assert backend.incr("rate:ip:1:5", ttl=2.5) == 1
+    fake.join()
+    assert fake.received == (
+        b"*6\r\n$3\r\nSET\r\n$11\r\nrate:ip:1:5\r\n$1\r\n0\r\n$2\r\nPX\r\n$4\r\n2500\r\n$2\r\nNX\r\n"
+        b"*2\r\n$4\r\nINCR\r\n$11\r\nrate:ip:1:5\r\n"
+    )
+
+
+def test_redis_does_not_resend_after_a_connection_drops_mid_call(monkeypatch):
+    dropped, spare = FakeRedis(None), FakeRedis(b":1\r\n")
+    backend, pending = redis_backend(monkeypatch, dropped, spare)
+    with pytest.raises(ConnectionError):
+        backend.incr("rate:ip:1:5", ttl=60)
+    dropped.join()
+    # The INCR may have been applied, so it is not sent again on a new connection
+    assert pending == [spare]
+    spare.client.close()
+    spare.join()
+
+
+def test_redis_replaces_a_pooled_connection_the_server_closed(monkeypatch):
+    stale, fresh = FakeRedis(b"+PONG\r\n"), FakeRedis(b"*1\r\n$1\r\n1\r\n")
+    backend, pending = redis_backend(monkeypatch, stale, fresh)
+    backend._send([["PING"]])
+    stale.join()
+    stale.server.close()
+    assert backend.get_many(["a"]) == {"a": b"1"}
+    fresh.join()
+    assert fresh.received.startswith(b"*2\r\n$4\r\nMGET")
+    assert pending == []
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app import main
+from app.services.subscription_service import SlowConsumerError, Subscriber, TickerHub
+
+
+def update(ticker, score):
+    return {"type": "update", "ticker": ticker, "analyses": [], "overall_sentiment_score": score}
+
+
+def drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(subscriber.queue.get_nowait())
+    return messages
+
+
+def test_subscribe_publish_and_unsubscribe():
+    async def scenario():
+        hub = TickerHub()
+        first, second = hub.connect(), hub.connect()
+        assert hub.subscribe(first, ["aapl", "../X", "MSFT", "AAPL"]) == ["AAPL", "MSFT"]
+        hub.subscribe(second, ["AAPL"])
+        assert hub.publish("AAPL", update("AAPL", 0.5)) == 2
+        assert [m["ticker"] for m in drain(first)] == ["AAPL"]
+        hub.unsubscribe(first, ["aapl"])
+        assert first.tickers == {"MSFT"}
+        assert hub.publish("AAPL", update("AAPL", 0.4)) == 1
+        assert drain(first) == []
+        hub.disconnect(second)
+        assert hub.metrics()["subscribers_by_ticker"] == {"MSFT": 1}
+
+    asyncio.run(scenario())
+
+
+def test_late_subscribers_get_a_snapshot_of_watched_tickers_only():
+    async def scenario():
+        hub = TickerHub()
+        watcher = hub.connect()
+        hub.subscribe(watcher, ["AAPL"])
+        hub.publish("AAPL", update("AAPL", 0.5))
+        # Nobody watches MSFT, so nothing is kept for it
+        hub.publish("MSFT", update("MSFT", 0.1))
+        late = hub.connect()
+        hub.subscribe(late, ["AAPL", "MSFT"])
+        assert [(m["type"], m["ticker"]) for m in drain(late)] == [("snapshot", "AAPL")]
+        hub.disconnect(watcher)
+        hub.disconnect(late)
+        assert hub._latest == {}
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_drops_oldest_and_flags_slow_consumers():
+    async def scenario():
+        subscriber = Subscriber(queue_size=2, max_dropped=1)
+        for score in (0.1, 0.2, 0.3):
+            subscriber.offer(update("AAPL", score))
+        assert [m["overall_sentiment_score"] for m in drain(subscriber)] == [0.2, 0.3]
+        assert not subscriber.too_slow
+        for score in (0.4, 0.5, 0.6, 0.7):
+            subscriber.offer(update("AAPL", score))
+        with pytest.raises(SlowConsumerError):
+            await asyncio.wait_for(subscriber.wait_too_slow(), timeout=1)
+
+    asyncio.run(scenario())
+
+
+class TinyQueueHub(TickerHub):
+    """Gives every connection a one-message queue that may not drop anything."""
+
+    def connect(self):
+        subscriber = Subscriber(queue_size=1, max_dropped=0)
+        self._connections.add(subscriber)
+        return subscriber
+
+
+@pytest.fixture
+def client(monkeypatch):
+    hub = TickerHub()
+    monkeypatch.setattr(main, "ticker_hub", hub)
+    return TestClient(main.app), hub
+
+
+def test_socket_subscribes_and_answers_bad_input_with_an_error(client):
+    test_client, hub = client
+    with test_client.websocket_connect("/api/ws/tickers?tickers=AAPL") as ws:
+        assert ws.receive_json() == {"type": "subscribed", "tickers": ["AAPL"], "added": ["AAPL"]}
+        for frame in ("not json", '{"action": "explode"}', '{"action": "subscribe", "tickers": "MSFT"}'):
+            ws.send_text(frame)
+            assert ws.receive_json()["type"] == "error"
+        ws.send_bytes(b'{"action": "subscribe", "tickers": ["MSFT"]}')
+        assert ws.receive_json()["type"] == "error"
+        # The connection survives bad input
+        ws.send_json({"action": "subscribe", "tickers": ["msft"]})
+        assert ws.receive_json() == {"type": "subscribed", "tickers": ["AAPL", "MSFT"], "added": ["MSFT"]}
+        ws.send_json({"action": "unsubscribe", "tickers": ["AAPL"]})
+        assert ws.receive_json() == {"type": "unsubscribed", "tickers": ["MSFT"]}
+    assert hub.metrics()["connections"] == 0
+
+
+def test_socket_closes_slow_consumers_with_1013(monkeypatch):
+    hub = TinyQueueHub()
+    monkeypatch.setattr(main, "ticker_hub", hub)
+    watcher = Subscriber()
+    hub._subscribers["AAPL"] = {watcher}
+    hub.publish("AAPL", update("AAPL", 0.5))
+    # The snapshot fills the queue and the subscribed reply drops it before the sender runs
+    with TestClient(main.app).websocket_connect("/api/ws/tickers?tickers=AAPL") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            for _ in range(3):
+                assert ws.receive_json()["type"] == "subscribed"
+    assert closed.value.code == 1013
+    assert hub.metrics()["slow_consumer_disconnects"] == 1
+    assert hub.metrics()["subscribers_by_ticker"] == {"AAPL": 1}
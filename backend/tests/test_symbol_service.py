@@ -0,0 +1,42 @@
+import pytest
+
+from app.services.symbol_service import build_query, is_relevant, lookup_symbol, relevance_score
+
+
+def article(title, description=""):
+    return {"title": title, "description": description}
+
+
+def test_lookup_and_query():
+    symbol = lookup_symbol("v")
+    assert symbol.name == "Visa Inc."
+    assert symbol.ambiguous
+    # Ambiguous tickers are searched by name only
+    assert build_query("V") == '"Visa Inc." OR "Visa"'
+    assert lookup_symbol("NOPE") is None
+    assert build_query("NOPE") == "NOPE"
+
+
+@pytest.mark.parametrize("ticker, title, description", [
+    ("V", "US tightens student visa rules", "New H-1B visa fees take effect next month."),
+    ("AAPL", "Best apple pie recipes for the fall", "Bake with tart apples."),
+    ("TGT", "Fed keeps its inflation target unchanged", ""),
+])
+def test_common_words_in_lower_case_are_not_the_company(ticker, title, description):
+    assert relevance_score(ticker, article(title, description)) == 0.0
+    assert not is_relevant(ticker, article(title, description))
+
+
+@pytest.mark.parametrize("ticker, title, description", [
+    ("V", "Visa beats estimates as cross-border volume grows", ""),
+    ("V", "Payments stocks rally", "VISA and Mastercard led the gains."),
+    ("AAPL", "Tech shares climb", "Apple Inc. shares rose 2% after the launch."),
+    ("V", "Card networks face new rules", "Shares of (NYSE: V) slipped."),
+])
+def test_company_mentions_are_relevant(ticker, title, description):
+    assert is_relevant(ticker, article(title, description))
+
+
+def test_unindexed_tickers_are_not_filtered():
+    assert relevance_score("ZZZZ", article("Anything")) is None
+    assert is_relevant("ZZZZ", article("Anything"))
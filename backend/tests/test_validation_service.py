@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from app.services.validation_service import (
+    check_analysis,
+    coerce_list,
+    coerce_score,
+    coerce_text,
+    merge_reask,
+    normalize_label,
+    repair_fields,
+)
+
+VALID = {
+    "summary": "Results beat expectations.",
+    "sentiment": "positive",
+    "sentiment_score": 0.6,
+    "key_takeaways": ["Revenue up", "Guidance raised"],
+    "significant_quotes": ["We had a record quarter"],
+}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.5, 0.5),
+    (-1, -1.0),
+    ("0.25", 0.25),
+    (" -0.4 ", -0.4),
+    ("85%", 0.85),
+    ("-40 %", -0.4),
+    ("150%", 1.0),
+    (3, 1.0),
+    (-2.5, -1.0),
+    ("n/a", None),
+    ("nan", None),
+    (float("nan"), None),
+    (True, None),
+    (None, None),
+    ([0.5], None),
+])
+def test_coerce_score(value, expected):
+    assert coerce_score(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Positive", "positive"),
+    (" NEGATIVE ", "negative"),
+    ("bullish", "positive"),
+    ("Bearish", "negative"),
+    ("mixed", "neutral"),
+    ("great", None),
+    (1, None),
+])
+def test_normalize_label(value, expected):
+    assert normalize_label(value) == expected
+
+
+def test_coerce_text_and_list():
+    assert coerce_text(["One.", "Two."]) == "One. Two."
+    assert coerce_text("   ") is None
+    assert coerce_list("- first\n- second\n") == ["first", "second"]
+    assert coerce_list(["a", None, " ", 3]) == ["a", "3"]
+    assert coerce_list({"a": 1}) is None
+
+
+def test_valid_response_passes_unchanged():
+    fields, _, invalid, outcome = check_analysis(json.dumps(VALID))
+    assert outcome == "valid"
+    assert invalid == []
+    assert fields == VALID
+
+
+def test_repairs_fenced_response_with_loose_fields():
+    text = "Here you go:\n```json\n" + json.dumps({
+        "summary": "Results beat expectations.",
+        "sentiment": "Bullish",
+        "sentiment_score": "85%",
+        "key_takeaways": "- Revenue up\n- Guidance raised",
+    }) + "\n```"
+    fields, _, invalid, outcome = check_analysis(text)
+    assert outcome == "repaired"
+    assert invalid == []
+    assert fields["sentiment"] == "positive"
+    assert fields["sentiment_score"] == 0.85
+    assert fields["key_takeaways"] == ["Revenue up", "Guidance raised"]
+    assert fields["significant_quotes"] == []
+
+
+def test_label_inferred_from_score():
+    repaired, invalid = repair_fields({**VALID, "sentiment": "unsure", "sentiment_score": -0.5})
+    assert invalid == []
+    assert repaired["sentiment"] == "negative"
+
+
+def test_unrepairable_fields_are_reported():
+    fields, repaired, invalid, outcome = check_analysis(json.dumps({"summary": "Only a summary"}))
+    assert outcome == "invalid"
+    assert fields is None
+    assert repaired["summary"] == "Only a summary"
+    assert sorted(invalid) == ["key_takeaways", "sentiment", "sentiment_score"]
+
+
+def test_garbage_marks_everything_invalid():
+    _, _, invalid, outcome = check_analysis("I cannot help with that.")
+    assert outcome == "invalid"
+    assert sorted(invalid) == ["key_takeaways", "sentiment", "sentiment_score", "summary"]
+
+
+def test_merge_reask_fills_only_requested_fields():
+    repaired, invalid = repair_fields({**VALID, "sentiment_score": "high", "sentiment": None})
+    assert invalid == ["sentiment_score", "sentiment"]
+    reply = json.dumps({"sentiment_score": 0.3, "sentiment": "neutral", "summary": "ignored"})
+    analysis = merge_reask(repaired, invalid, reply)
+    assert analysis.sentiment_score == 0.3
+    assert analysis.sentiment == "neutral"
+    assert analysis.summary == VALID["summary"]
+
+
+def test_merge_reask_still_invalid():
+    repaired, invalid = repair_fields({**VALID, "key_takeaways": []})
+    assert merge_reask(repaired, invalid, json.dumps({"key_takeaways": []})) is None
+    assert merge_reask(repaired, invalid, "not json") is None
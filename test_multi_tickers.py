@@ -16,7 +16,7 @@ async def test_ticker(session, ticker):
     start_time = time.time()
     try:
         url = "https://rust-carfagno-enterprises-3.onrender.com/analyze"
-        async with session.post(url, json={"ticker": ticker}) as response:
+        async with session.post(url, json={"ticker": ticker}, headers={"X-Request-Priority": "background"}) as response:
             if response.status == 200:
                 data = await response.json()
                 duration = time.time() - start_time
@@ -8,7 +8,7 @@ async def fetch_analysis(session, ticker):
     url = "https://rust-carfagno-enterprises-3.onrender.com/analyze"
     start_time = time.time()
     try:
-        async with session.post(url, json={"ticker": ticker}) as response:
+        async with session.post(url, json={"ticker": ticker}, headers={"X-Request-Priority": "background"}) as response:
             elapsed = time.time() - start_time
             return {
                 "status": response.status,